@@ -1,33 +1,14 @@
+import time
 import streamlit as st
-import pandas as pd
 from services.auth import check_authentication
+from services.user_directory import identity_role, rep_name
+from services.rerun_timing import record_run, render_timings
+from services.tracing import get_metrics_exporter, render_traces
+from services.utils import render_google_status
 
-st.set_page_config(page_title="Solicitud de Anticipo", layout="wide")
-
-def identity_role(email):
-    admin = [
-        "manager@tradingsolutions.com", "jsanchez@tradingsolutions.com", "pricing2@tradingsolutions.com", "pricing@tradingsolutions.com", "pricing@tradingsol.com",
-        "manager@tradingsol.com", "jsanchez@tradingsol.com", "pricing2@tradingsol.com", "sjaafar@tradingsolutions.com"
-    ]
-
-    commercial = [
-        "sales2@tradingsolutions.com", "sales1@tradingsolutions.com", "sales3@tradingsolutions.com", "sales4@tradingsolutions.com", "sales@tradingsolutions.com",
-        "sales5@tradingsolutions.com", "bds@tradingsolutions.com", "insidesales@tradingsolutions.com", "sales6@tradingsolutions.com", "sales5@tradingsolutions.com"
-
-        "sales2@tradingsol.com", "sales1@tradingsol.com", "sales3@tradingsol.com", "sales4@tradingsol.com", "sales@tradingsol.com",
-        "sales5@tradingsol.com", "bds@tradingsol.com", "insidesales@tradingsol.com", "sales6@tradingsol.com", "sales5@tradingsol.com"
-    ]
+_run_start = time.perf_counter()
 
-    inside =["pricing7@tradingsolutions.com", "traffic2@traingsolutions.com", "customer3@tradingsolutions.com", "trainer@tradingsolutions.com", "customer@tradingsolutions.com"]
-
-    if email in admin:
-        return "admin"
-    elif email in inside:
-        return "inside"
-    elif email in commercial:
-        return "commercial"
-    else:
-        return None
+st.set_page_config(page_title="Solicitud de Anticipo", layout="wide")
 
 @st.dialog("Warning", width="large")
 def non_identiy():
@@ -39,6 +20,8 @@ col1, col2, col3 = st.columns([1, 2, 1])
 with col2:
     st.image("resources/images/logo_trading.png", width=800)
 
+get_metrics_exporter()
+
 check_authentication()
 role = identity_role(st.experimental_user.email)
 
@@ -49,8 +32,18 @@ else:
 
     if role in ["commercial", "admin", "inside"]:
         with st.sidebar:
-            page = st.radio("Go to", ["Home",  "Generar Documento"])
+            page = st.radio("Go to", ["Home",  "Generar Documento", "History"])
 
         if page == "Generar Documento":
             import views.Payment_Request as payment 
             payment.show(role)
+        elif page == "History":
+            import views.History as history
+            history.show(role, rep_name(st.experimental_user.email))
+
+record_run("app", _run_start)
+if role == "admin":
+    with st.sidebar:
+        render_timings()
+        render_traces()
+        render_google_status()
@@ -0,0 +1,118 @@
+"""Mide el export de la hoja a Parquet/CSV y una consulta de reporte sobre el dataset.
+
+La hoja es una versión en memoria con filas sintéticas repartidas en varios años; no hace
+llamadas a Google. Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.bench_export --rows 50000 --append 1000 --format parquet
+"""
+import argparse
+import random
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from benchmarks.bench_pipeline import COMMERCIALS, CONCEPTS, CONTAINERS
+from services.export_dataset import FORMATS, DatasetExport
+from services.request_history import COLUMNS
+
+
+class FakeWorksheet:
+    def __init__(self, rows):
+        self.rows = rows
+
+    @property
+    def row_count(self):
+        return len(self.rows)
+
+    def batch_get(self, ranges, value_render_option=None):
+        # Rangos "A{inicio}:Q{fin}"; la API recorta las filas vacías del final
+        blocks = []
+        for range_name in ranges:
+            first, last = map(int, re.findall(r"\d+", range_name))
+            values = self.rows[first - 1:last]
+            while values and not values[-1]:
+                values = values[:-1]
+            blocks.append(values)
+        return blocks
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheet):
+        self._worksheet = worksheet
+
+    def worksheet(self, name):
+        return self._worksheet
+
+
+def synthetic_row(rng, number, start):
+    time_str = (start + timedelta(minutes=number * 30 + rng.randint(0, 29))).strftime("%Y-%m-%d %H:%M:%S")
+    lines, totals = [], {"USD": 0.0, "COP": 0.0}
+    for container in rng.sample(CONTAINERS, rng.randint(1, 3)):
+        for _ in range(rng.randint(1, 5)):
+            currency = rng.choice(("USD", "COP"))
+            cost = round(rng.uniform(10, 5_000 if currency == "USD" else 5_000_000), 2)
+            totals[currency] += cost
+            lines.append(f"{container} - {rng.choice(CONCEPTS)}: ${cost:.2f} {currency}")
+    trm = round(rng.uniform(3800, 4400), 2) if totals["USD"] and totals["COP"] else ""
+    values = {
+        "commercial": rng.choice(COMMERCIALS), "time": time_str, "client": f"CLIENTE {rng.randint(1, 2000)}",
+        "customer_name": "Contacto", "customer_phone": "3000000000", "customer_email": "contacto@example.com",
+        "container_type": "", "transport_type": "Flete Internacional", "operation_type": "FCL", "reference": "",
+        "surcharges": "\n".join(lines), "total_usd": totals["USD"], "total_cop": totals["COP"], "trm": trm,
+        "total_cop_trm": "", "request_id": number, "no_solicitud": f"M{number}",
+    }
+    return [values[column] for column in COLUMNS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--append", type=int, default=1_000)
+    parser.add_argument("--format", choices=FORMATS, default="parquet")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = datetime(2020, 1, 1)
+    rows = [["Commercial", "Time"]] + [synthetic_row(rng, number, start) for number in range(1, args.rows + 1)]
+    spreadsheet = FakeSpreadsheet(FakeWorksheet(rows))
+
+    with tempfile.TemporaryDirectory() as output:
+        export = DatasetExport(output, args.format, open_spreadsheet=lambda: spreadsheet)
+
+        summary = export.run()
+        print(
+            f"export inicial   {summary['requests']:>8} solicitudes {summary['surcharge_lines']:>8} líneas "
+            f"{summary['months']:>4} meses {summary['reads']:>4} lecturas  {summary['seconds'] * 1000:9.1f} ms"
+        )
+
+        rows.extend(synthetic_row(rng, number, start) for number in range(args.rows + 1, args.rows + args.append + 1))
+        summary = export.run()
+        print(
+            f"export agregado  {summary['requests']:>8} solicitudes {summary['surcharge_lines']:>8} líneas "
+            f"{summary['months']:>4} meses {summary['reads']:>4} lecturas  {summary['seconds'] * 1000:9.1f} ms"
+        )
+
+        if args.format != "parquet":
+            return
+
+        began = time.perf_counter()
+        requests = pd.read_parquet(f"{output}/requests", columns=["commercial", "total_usd", "total_cop", "month"])
+        lines = pd.read_parquet(f"{output}/surcharge_lines", columns=["concept", "currency", "cost", "month"])
+        loaded = time.perf_counter() - began
+
+        began = time.perf_counter()
+        by_commercial = requests.groupby(["month", "commercial"], observed=True)[["total_usd", "total_cop"]].sum()
+        by_concept = lines.groupby(["month", "concept", "currency"], observed=True)["cost"].agg(["sum", "count"])
+        queried = time.perf_counter() - began
+        print(
+            f"lectura          {len(requests):>8} solicitudes {len(lines):>8} líneas  {loaded * 1000:9.1f} ms\n"
+            f"consulta         {len(by_commercial):>8} grupos      {len(by_concept):>8} grupos  {queried * 1000:9.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
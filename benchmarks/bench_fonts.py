@@ -0,0 +1,74 @@
+"""Mide el import de services.write_pdf, el primer PDF, el overlay y el tamaño del PDF final.
+
+El import y el primer PDF corren en un proceso nuevo para que no haya fuentes ni templates
+ya cargados. Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.bench_fonts --runs 5 --iterations 20
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_pdf_io import SAMPLE_REQUEST
+
+DEPENDENCIES = "import streamlit, PyPDF2, reportlab.pdfgen.canvas, pandas"
+
+COLD_SNIPPET = f"""
+import time
+{DEPENDENCIES}
+start = time.perf_counter()
+import services.write_pdf as write_pdf
+imported = time.perf_counter() - start
+from benchmarks.bench_pdf_io import SAMPLE_REQUEST
+start = time.perf_counter()
+write_pdf.generate_pdf(SAMPLE_REQUEST)
+print(imported, time.perf_counter() - start)
+"""
+
+
+def run(snippet):
+    result = subprocess.run([sys.executable, "-c", snippet], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return [float(value) for value in result.stdout.split()]
+
+
+def report(label, samples):
+    samples = [sample * 1000 for sample in samples]
+    print(f"{label:<34} mediana {statistics.median(samples):8.2f} ms  (min {min(samples):.2f} ms)")
+
+
+def timed(func, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return samples, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    cold = [sample for sample in (run(COLD_SNIPPET) for _ in range(args.runs)) if sample]
+    report("import services.write_pdf", [sample[0] for sample in cold])
+    report("primer generate_pdf (en frío)", [sample[1] for sample in cold])
+
+    from services.write_pdf import create_overlay, generate_pdf
+
+    generate_pdf(SAMPLE_REQUEST)  # calentamiento
+    overlay, overlay_bytes = timed(lambda: create_overlay(SAMPLE_REQUEST, layered=True), args.iterations)
+    total, pdf_bytes = timed(lambda: generate_pdf(SAMPLE_REQUEST), args.iterations)
+    report("create_overlay (layered)", overlay)
+    report("generate_pdf", total)
+    print(f"{'overlay':<34} {len(overlay_bytes) / 1024:8.1f} KiB")
+    print(f"{'PDF final':<34} {len(pdf_bytes) / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compara el flujo de generate_pdf basado en archivos contra el flujo en memoria.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.bench_pdf_io --iterations 20 --threads 4
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.write_pdf import generate_pdf
+
+SAMPLE_REQUEST = {
+    "no_solicitud": "M1234",
+    "commercial": "Pedro Luis Bruges",
+    "client": "360 LOGISICTS GROUP LIMITED",
+    "customer_name": "Juan",
+    "customer_phone": "321628",
+    "customer_email": "juan@trading.com",
+    "container_type": ["20' Dry Standard"],
+    "transport_type": ["Flete Internacional", "Transporte Terrestre"],
+    "operation_type": "FCL",
+    "reference": "1234",
+    "additional_surcharges": {
+        "20' Dry Standard": [
+            {"concept": "Flete", "currency": "USD", "cost": 100.0},
+            {"concept": "Origen", "currency": "COP", "cost": 200.0},
+        ]
+    },
+    "trm": 4100.5,
+    "total_cop_trm": "$410.250,00 COP",
+}
+
+
+def run_file_based(workdir, worker_id):
+    # Cada hilo usa sus propias rutas; con las rutas fijas originales los hilos se pisarían
+    overlay_path = os.path.join(workdir, f"overlay_{worker_id}.pdf")
+    output_path = os.path.join(workdir, f"Solicitud_{worker_id}.pdf")
+    generate_pdf(SAMPLE_REQUEST, output_path=output_path, overlay_path=overlay_path)
+    with open(output_path, "rb") as f:
+        return f.read()
+
+
+def run_in_memory(workdir, worker_id):
+    return generate_pdf(SAMPLE_REQUEST)
+
+
+def measure(label, func, iterations, threads):
+    with tempfile.TemporaryDirectory() as workdir:
+        func(workdir, 0)  # calentamiento
+
+        start = time.perf_counter()
+        if threads == 1:
+            for i in range(iterations):
+                func(workdir, i)
+        else:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(lambda i: func(workdir, i), range(iterations)))
+        elapsed = time.perf_counter() - start
+
+    rps = iterations / elapsed
+    print(f"{label:<12} threads={threads:<3} {iterations} docs en {elapsed:.2f}s -> {rps:.2f} req/s")
+    return rps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+
+    file_rps = measure("archivos", run_file_based, args.iterations, args.threads)
+    memory_rps = measure("memoria", run_in_memory, args.iterations, args.threads)
+    print(f"speedup: {memory_rps / file_rps:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Mide por etapa el pipeline de la solicitud de anticipo con solicitudes sintéticas.
+
+Etapas: create_overlay, wrapped_draw_string, merge_pdfs, la fila de Sheets (agregación de
+recargos), la cola local y el envío a una hoja falsa en memoria, el registro local de
+solicitudes con su sincronización, generate_pdf completo y el archivo del PDF en Drive. No hace llamadas a Google: Sheets y Drive se reemplazan por
+versiones locales en memoria.
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.bench_pipeline --iterations 50 --output resultados.json
+    python -m benchmarks.bench_pipeline --scenarios small large --compare anterior.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from services.drive_archive import DriveArchiver
+from services.fonts import ensure_fonts
+from services.models import SolicitudRequest
+from services.request_store import REQUESTS_SHEET, SHEET_HEADERS, RequestStore
+from services.sheet_queue import SheetWriter
+from services.user_directory import user_data
+from services.write_pdf import (
+    TEMPLATE_PATH, create_overlay, generate_pdf, load_layered_template, merge_pdfs, wrapped_draw_string,
+)
+from tests.fake_drive import FakeDrive
+
+CONTAINERS = [
+    "20' Dry Standard", "40' Dry Standard", "40' Dry High Cube", "Reefer 20'", "Reefer 40'",
+    "Open Top 20'", "Open Top 40'", "Flat Rack 20'", "Flat Rack 40'",
+]
+TRANSPORTS = ["Flete Internacional", "Transporte Terrestre", "Agenciamiento "]
+COMMERCIALS = ["Pedro Luis Bruges", "Sharon Zuñiga", "Ivan Zuluaga", "Felipe Hoyos"]
+CONCEPTS = ["Flete", "Origen", "Destino", "THC", "BL", "Seguro", "Almacenaje", "Manejo", "Inspección", "Emisión"]
+
+# contenedores, recargos por contenedor, largo del nombre del cliente, monedas
+SCENARIOS = {
+    "small": {"containers": 1, "surcharges": 2, "name_length": 20, "currencies": ("USD",)},
+    "medium": {"containers": 3, "surcharges": 5, "name_length": 60, "currencies": ("USD", "COP")},
+    "large": {"containers": 6, "surcharges": 15, "name_length": 120, "currencies": ("USD", "COP")},
+    "xlarge": {"containers": 9, "surcharges": 40, "name_length": 250, "currencies": ("COP",)},
+}
+
+
+class FakeWorksheet:
+    def __init__(self, title):
+        self.title = title
+        self.rows = []
+
+    def append_row(self, row):
+        self.rows.append(row)
+
+    def append_rows(self, rows):
+        self.rows.extend(rows)
+
+    def get(self, range_name, value_render_option=None):
+        # Solo rangos de una columna hasta el final ("P2:P"), como los que lee RequestStore
+        column, start = range_name.split(":")[0][0], int(range_name.split(":")[0][1:])
+        index = ord(column) - ord("A")
+        values = [[row[index]] if len(row) > index and row[index] != "" else [] for row in self.rows[start - 1:]]
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+
+class FakeSpreadsheet:
+    def __init__(self):
+        self.worksheets = {}
+
+    def worksheet(self, name):
+        return self.worksheets.setdefault(name, FakeWorksheet(name))
+
+    def add_worksheet(self, title, rows, cols):
+        return self.worksheet(title)
+
+
+def client_name(rng, length):
+    words = []
+    while len(" ".join(words)) < length:
+        words.append("".join(rng.choices(string.ascii_uppercase, k=rng.randint(3, 12))))
+    return " ".join(words)[:length].strip()
+
+
+def synthetic_request(rng, containers, surcharges, name_length, currencies):
+    container_types = rng.sample(CONTAINERS, min(containers, len(CONTAINERS)))
+    additional = {
+        container: [
+            {
+                "concept": rng.choice(CONCEPTS),
+                "currency": rng.choice(currencies),
+                "cost": round(rng.uniform(10, 5_000_000 if "COP" in currencies else 5_000), 2),
+            }
+            for _ in range(surcharges)
+        ]
+        for container in container_types
+    }
+    mixed = len(set(currencies)) > 1
+    return {
+        "no_solicitud": f"M{rng.randint(1000, 99999)}",
+        "commercial": rng.choice(COMMERCIALS),
+        "client": client_name(rng, name_length),
+        "customer_name": client_name(rng, 20),
+        "customer_phone": str(rng.randint(3000000000, 3299999999)),
+        "customer_email": "cliente@example.com",
+        "container_type": container_types,
+        "transport_type": rng.sample(TRANSPORTS, rng.randint(1, len(TRANSPORTS))),
+        "operation_type": "FCL",
+        "reference": str(rng.randint(1, 99999)),
+        "additional_surcharges": additional,
+        "trm": round(rng.uniform(3800, 4400), 2) if mixed else None,
+        "total_cop_trm": "$1.000.000,00 COP",
+    }
+
+
+def stages(workdir):
+    writer = SheetWriter(os.path.join(workdir, "queue.db"), open_spreadsheet=FakeSpreadsheet, batch_size=50)
+
+    def wrap(data):
+        ensure_fonts()
+        c = canvas.Canvas(BytesIO(), pagesize=letter)
+        wrapped_draw_string(c, data["client"].upper(), 118, 570, "OpenSauceBold", 10, 200, 12)
+
+    def merge(data, overlay):
+        template = load_layered_template(TEMPLATE_PATH, user_data(data["commercial"]))
+        return merge_pdfs(template, overlay)
+
+    def enqueue(data):
+        writer.enqueue(REQUESTS_SHEET, SolicitudRequest.from_dict(data).to_sheet_row("2025-01-01 00:00:00"), headers=SHEET_HEADERS)
+        writer.flush()
+
+    store = RequestStore(os.path.join(workdir, "requests.db"), open_spreadsheet=FakeSpreadsheet)
+
+    def save_and_reconcile(data):
+        store.save(SolicitudRequest.from_dict(data), "2025-01-01 00:00:00")
+        store.reconcile()
+
+    drive = FakeDrive()
+    archiver = DriveArchiver(service_factory=lambda: drive, workers=1)
+    uploads = iter(range(10**9))
+
+    def archive(data, overlay):
+        # Se agrega un contador al PDF para que la deduplicación no se salte la subida
+        payload = overlay + str(next(uploads)).encode()
+        archiver.submit(payload, f"{data['no_solicitud']}.pdf", data["commercial"]).result()
+
+    return {
+        "create_overlay": lambda data, overlay: create_overlay(data, layered=True),
+        "wrapped_draw_string": lambda data, overlay: wrap(data),
+        "merge_pdfs": merge,
+        "sheet_row": lambda data, overlay: SolicitudRequest.from_dict(data).to_sheet_row("2025-01-01 00:00:00"),
+        "sheet_enqueue_flush": lambda data, overlay: enqueue(data),
+        "store_save_reconcile": lambda data, overlay: save_and_reconcile(data),
+        "generate_pdf": lambda data, overlay: generate_pdf(data),
+        "drive_archive": archive,
+    }
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def run_scenario(name, params, iterations, memory_iterations, seed):
+    rng = random.Random(f"{seed}-{name}")
+    requests = [synthetic_request(rng, **params) for _ in range(iterations)]
+    overlays = [create_overlay(data, layered=True) for data in requests]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for stage, func in stages(workdir).items():
+            # Calentamiento con cada comercial: caches de template, capas firmadas y fuentes
+            for index in {data["commercial"]: i for i, data in enumerate(requests)}.values():
+                func(requests[index], overlays[index])
+
+            samples = []
+            for data, overlay in zip(requests, overlays):
+                start = time.perf_counter()
+                func(data, overlay)
+                samples.append((time.perf_counter() - start) * 1000)
+
+            # Memoria en una pasada aparte: tracemalloc distorsiona los tiempos
+            tracemalloc.start()
+            peak = 0
+            for data, overlay in zip(requests[:memory_iterations], overlays[:memory_iterations]):
+                tracemalloc.reset_peak()
+                func(data, overlay)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+            results[stage] = {
+                "p50_ms": round(percentile(samples, 50), 3),
+                "p95_ms": round(percentile(samples, 95), 3),
+                "p99_ms": round(percentile(samples, 99), 3),
+                "mean_ms": round(statistics.fmean(samples), 3),
+                "peak_kib": round(peak / 1024, 1),
+            }
+    return results
+
+
+def report(results, baseline=None):
+    for scenario, stages_result in results["scenarios"].items():
+        params = results["params"][scenario]
+        print(
+            f"\n{scenario}: {params['containers']} contenedores x {params['surcharges']} recargos, "
+            f"cliente de {params['name_length']} caracteres, monedas {'/'.join(params['currencies'])}"
+        )
+        for stage, stats in stages_result.items():
+            line = (
+                f"  {stage:<20} p50 {stats['p50_ms']:8.3f} ms  p95 {stats['p95_ms']:8.3f} ms  "
+                f"p99 {stats['p99_ms']:8.3f} ms  pico {stats['peak_kib']:9.1f} KiB"
+            )
+            previous = (baseline or {}).get("scenarios", {}).get(scenario, {}).get(stage)
+            if previous and previous["p50_ms"]:
+                line += f"  ({stats['p50_ms'] / previous['p50_ms']:.2f}x p50 vs base)"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--memory-iterations", type=int, default=5)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args()
+
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "iterations": args.iterations,
+        "seed": args.seed,
+        "params": {name: SCENARIOS[name] for name in args.scenarios},
+        "scenarios": {
+            name: run_scenario(name, SCENARIOS[name], args.iterations, args.memory_iterations, args.seed)
+            for name in args.scenarios
+        },
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Mide el arranque en frío de services.utils y la creación de los clientes de Google.
+
+Cada medición corre en un proceso nuevo para que no haya módulos ya importados.
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+DEPENDENCIES = "import streamlit, gspread, googleapiclient.discovery"
+
+IMPORT_SNIPPET = f"""
+import time
+{DEPENDENCIES}
+start = time.perf_counter()
+import services.utils
+print(time.perf_counter() - start)
+"""
+
+CLIENTS_SNIPPET = f"""
+import time
+{DEPENDENCIES}
+import services.utils as utils
+start = time.perf_counter()
+utils.get_gspread_client()
+utils.get_sheets_service()
+utils.get_drive_service()
+first = time.perf_counter() - start
+start = time.perf_counter()
+utils.get_gspread_client()
+utils.get_sheets_service()
+utils.get_drive_service()
+print(first, time.perf_counter() - start)
+"""
+
+
+def run(snippet):
+    result = subprocess.run([sys.executable, "-c", snippet], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return [float(value) for value in result.stdout.split()]
+
+
+def report(label, samples):
+    samples = [sample * 1000 for sample in samples]
+    print(f"{label:<34} mediana {statistics.median(samples):8.2f} ms  (min {min(samples):.2f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports = [run(IMPORT_SNIPPET) for _ in range(args.runs)]
+    report("import services.utils", [sample[0] for sample in imports if sample])
+
+    clients = [run(CLIENTS_SNIPPET) for _ in range(args.runs)]
+    clients = [sample for sample in clients if sample]
+    if not clients:
+        print("Clientes de Google: sin secretos configurados, se omite la medición")
+        return
+    report("primera creación de clientes", [sample[0] for sample in clients])
+    report("acceso a clientes ya creados", [sample[1] for sample in clients])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Mide cómo escala la tabla de recargos paginada con el número de filas.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.bench_surcharge_table --rows 10 100 1000 --iterations 5
+"""
+import argparse
+import statistics
+import time
+
+from PyPDF2 import PdfReader
+from io import BytesIO
+
+from benchmarks.bench_pdf_io import SAMPLE_REQUEST
+from services.write_pdf import create_overlay, generate_pdf
+
+CONTAINERS = ["20' Dry Standard", "40' Dry Standard", "Reefer 20'"]
+
+
+def request_with_rows(rows):
+    surcharges = {container: [] for container in CONTAINERS}
+    for i in range(rows):
+        surcharges[CONTAINERS[i % len(CONTAINERS)]].append(
+            {"concept": f"Recargo {i}", "currency": "USD" if i % 3 else "COP", "cost": 10.0 * i}
+        )
+    return dict(SAMPLE_REQUEST, container_type=CONTAINERS, additional_surcharges=surcharges)
+
+
+def timed(func, data, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = func(data)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    generate_pdf(request_with_rows(1))  # calentamiento
+
+    for rows in args.rows:
+        data = request_with_rows(rows)
+        overlay_ms, _ = timed(lambda d: create_overlay(d, layered=True), data, args.iterations)
+        total_ms, pdf_bytes = timed(generate_pdf, data, args.iterations)
+        pages = len(PdfReader(BytesIO(pdf_bytes)).pages)
+        print(
+            f"{rows:>6} filas  {pages:>3} páginas  overlay {overlay_ms:8.1f} ms  generate_pdf {total_ms:8.1f} ms  "
+            f"({total_ms / rows:.3f} ms/fila)  {len(pdf_bytes) / 1024:.0f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
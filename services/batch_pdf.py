@@ -0,0 +1,135 @@
+"""Generación masiva de solicitudes de anticipo en paralelo.
+
+Uso desde la raíz del repositorio:
+
+    python -m services.batch_pdf solicitudes.json -o solicitudes.zip --workers 4
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from services.write_pdf import TEMPLATE_PATH, generate_pdf, load_template, static_layer
+
+# Columnas que en un CSV vienen codificadas como JSON (listas / diccionarios)
+JSON_COLUMNS = ("container_type", "transport_type", "additional_surcharges")
+
+def load_requests(path):
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == ".json":
+        with open(path, encoding="utf-8") as f:
+            requests = json.load(f)
+        return requests if isinstance(requests, list) else [requests]
+
+    if extension == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    if extension == ".csv":
+        requests = []
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                for column in JSON_COLUMNS:
+                    if row.get(column):
+                        row[column] = json.loads(row[column])
+                if row.get("trm") in ("", None):
+                    row["trm"] = None
+                requests.append(row)
+        return requests
+
+    raise ValueError(f"Formato de archivo no soportado: {path}")
+
+def pdf_filename(index, data):
+    no_solicitud = re.sub(r"[^\w.-]+", "_", str(data.get("no_solicitud") or "").strip())
+    return f"{index + 1:04d}_{no_solicitud or 'solicitud'}.pdf"
+
+def _init_worker(template_path):
+    # static_layer registra las fuentes; el template y la capa estática quedan en la caché
+    # del proceso antes de recibir la primera solicitud.
+    load_template(template_path)
+    static_layer()
+
+def _render(index, data, template_path):
+    try:
+        return index, generate_pdf(data, template_path), None
+    except Exception as e:
+        return index, None, f"{type(e).__name__}: {e}"
+
+def generate_batch(requests, output, template_path=TEMPLATE_PATH, workers=None, window=None):
+    workers = workers or os.cpu_count() or 1
+    window = window or workers * 4
+
+    requests = iter(requests)
+    names = {}
+    errors = []
+    documents = 0
+    start = time.perf_counter()
+
+    # spawn y no fork: desde el servidor de Streamlit el proceso tiene hilos (réplicas, colas,
+    # el propio servidor) y un fork copiaría sus locks tomados
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(template_path,)) as pool, \
+            zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED) as archive:
+        pending = set()
+        index = 0
+        exhausted = False
+
+        while pending or not exhausted:
+            # Ventana acotada de trabajos en vuelo: la memoria no crece con el tamaño del lote
+            while not exhausted and len(pending) < window:
+                data = next(requests, None)
+                if data is None:
+                    exhausted = True
+                    break
+                names[index] = pdf_filename(index, data)
+                pending.add(pool.submit(_render, index, data, template_path))
+                index += 1
+
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                position, pdf_bytes, error = future.result()
+                if error:
+                    errors.append({"index": position, "file": names[position], "error": error})
+                else:
+                    archive.writestr(names[position], pdf_bytes)
+                    documents += 1
+
+    elapsed = time.perf_counter() - start
+    return {
+        "documents": documents,
+        "errors": errors,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "docs_per_second": round(documents / elapsed, 2) if elapsed else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="Archivo .json, .jsonl o .csv con las solicitudes")
+    parser.add_argument("-o", "--output", default="solicitudes.zip")
+    parser.add_argument("--template", default=TEMPLATE_PATH)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.output, "wb") as output:
+        summary = generate_batch(load_requests(args.input), output, args.template, args.workers)
+
+    print(
+        f"{summary['documents']} PDFs en {summary['seconds']}s con {summary['workers']} procesos "
+        f"({summary['docs_per_second']} docs/s) -> {args.output}"
+    )
+    for error in summary["errors"]:
+        print(f"⚠️ {error['file']}: {error['error']}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import difflib
+import re
+import unicodedata
+from bisect import bisect_left
+
+DEFAULT_LIMIT = 20
+FUZZY_CUTOFF = 0.75
+
+# Índice de búsqueda de clientes. Se construye una vez por versión de la lista: las llaves
+# van sin tildes, en minúsculas y con los espacios colapsados, para que "Logística  SAS" y
+# "logistica sas" sean el mismo cliente.
+
+def normalize(name):
+    text = unicodedata.normalize("NFKD", str(name))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+def _prefix_range(keys, prefix):
+    start = bisect_left(keys, prefix)
+    end = bisect_left(keys, prefix + "\uffff", start)
+    return start, end
+
+class ClientIndex:
+    def __init__(self, names):
+        self._by_key = {}
+        for name in names:
+            key = normalize(name)
+            if key and key not in self._by_key:
+                self._by_key[key] = name
+
+        self._keys = sorted(self._by_key)
+
+        # Palabras de cada cliente, para encontrar "GROUP" dentro de "360 LOGISTICS GROUP"
+        words = {}
+        for key in self._keys:
+            for word in set(key.split(" ")):
+                words.setdefault(word, []).append(key)
+        self._words = sorted(words)
+        self._keys_by_word = words
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, name):
+        return normalize(name) in self._by_key
+
+    def get(self, name):
+        # Nombre ya registrado que coincide con `name` después de normalizar, o None
+        return self._by_key.get(normalize(name))
+
+    def search(self, query, limit=DEFAULT_LIMIT, fuzzy=True):
+        # fuzzy=False: solo nombre completo por prefijo o palabras completas/prefijo, sin difflib
+        query = normalize(query or "")
+        if not query:
+            return [self._by_key[key] for key in self._keys[:limit]]
+
+        found = {}
+
+        def collect(keys):
+            for key in keys:
+                if len(found) >= limit:
+                    return
+                found.setdefault(key, None)
+
+        # 1. El nombre completo empieza por la búsqueda
+        start, end = _prefix_range(self._keys, query)
+        collect(self._keys[start:end])
+
+        # 2. Alguna palabra empieza por la primera palabra buscada y el nombre contiene el resto
+        if len(found) < limit:
+            first = query.split(" ")[0]
+            start, end = _prefix_range(self._words, first)
+            for word in self._words[start:end]:
+                collect(key for key in self._keys_by_word[word] if query in key)
+
+        # 3. Errores de digitación: palabras parecidas y nombres completos parecidos
+        if fuzzy and len(found) < limit and len(query) >= 3:
+            for token in query.split(" "):
+                for word in difflib.get_close_matches(token, self._words, n=5, cutoff=FUZZY_CUTOFF):
+                    collect(self._keys_by_word[word])
+            collect(difflib.get_close_matches(query, self._keys, n=limit, cutoff=FUZZY_CUTOFF))
+
+        return [self._by_key[key] for key in found]
@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from functools import lru_cache
+
+import gspread
+import streamlit as st
+
+from services.client_index import ClientIndex, normalize
+from services.local_sync import connect
+from services.sheet_queue import enqueue_row
+from services.tracing import span
+from services.utils import get_spreadsheet
+
+CLIENTS_PATH = "data/clients.db"
+CLIENTS_SHEET = "clientes"
+SYNC_INTERVAL = 300
+
+# Réplica local de la pestaña "clientes". La lista se sirve desde memoria/SQLite; un hilo en
+# segundo plano trae solo las filas nuevas de la hoja (a partir de la última fila conocida).
+# Los clientes nuevos se guardan localmente al instante y se envían a la hoja por la cola.
+
+class ClientReplica:
+    def __init__(self, path=CLIENTS_PATH, open_spreadsheet=get_spreadsheet, sync_interval=SYNC_INTERVAL):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.open_spreadsheet = open_spreadsheet
+        self.sync_interval = sync_interval
+        self.last_sync = None
+        self.last_error = None
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        with connect(self.path) as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS clients ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " name TEXT NOT NULL,"
+                " sheet_row INTEGER UNIQUE)"
+            )
+            rows = connection.execute("SELECT name FROM clients ORDER BY id").fetchall()
+
+        self._names = [row[0] for row in rows]
+        self._keys = {normalize(name) for name in self._names}
+        # Cambia cada vez que cambia la lista; sirve para invalidar lo que se construya encima
+        self.version = len(self._names)
+
+    def names(self):
+        return self._names
+
+    def __contains__(self, name):
+        return normalize(name) in self._keys
+
+    def _append(self, name):
+        # Copia nueva de la lista: quien esté leyendo la anterior no la ve cambiar
+        self._names = self._names + [name]
+        self._keys.add(normalize(name))
+        self.version += 1
+
+    def add(self, name):
+        name = name.strip()
+        with self._lock:
+            if not name or name in self:
+                return False
+            with connect(self.path) as connection:
+                connection.execute("INSERT INTO clients (name) VALUES (?)", (name,))
+            self._append(name)
+
+        enqueue_row(CLIENTS_SHEET, [name], headers=["Cliente"])
+        return True
+
+    def sync(self):
+        with span("clients.sync"), connect(self.path) as connection:
+            last_row = connection.execute("SELECT COALESCE(MAX(sheet_row), 1) FROM clients").fetchone()[0]
+
+            try:
+                worksheet = self.open_spreadsheet().worksheet(CLIENTS_SHEET)
+            except gspread.exceptions.WorksheetNotFound:
+                return 0
+
+            # Solo las filas que están después de la última que ya tenemos (la fila 1 es el encabezado)
+            values = worksheet.get(f"A{last_row + 1}:A")
+
+            added = 0
+            with self._lock:
+                for offset, cells in enumerate(values):
+                    name = cells[0].strip() if cells else ""
+                    if not name:
+                        continue
+                    row = last_row + 1 + offset
+
+                    # Un cliente creado aquí y ya escrito en la hoja: se enlaza con su fila
+                    pending = next(
+                        (item for item in connection.execute("SELECT id, name FROM clients WHERE sheet_row IS NULL ORDER BY id")
+                         if normalize(item[1]) == normalize(name)),
+                        None,
+                    )
+                    if pending:
+                        connection.execute("UPDATE clients SET sheet_row = ? WHERE id = ?", (row, pending[0]))
+                        continue
+
+                    connection.execute("INSERT OR IGNORE INTO clients (name, sheet_row) VALUES (?, ?)", (name, row))
+                    if name not in self:
+                        self._append(name)
+                        added += 1
+
+        self.last_sync = time.time()
+        return added
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="clients-sync", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sync()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"⚠️ No se pudo sincronizar la lista de clientes ({self.last_error}).")
+            self._stop.wait(self.sync_interval)
+
+@st.cache_resource(show_spinner=False)
+def get_client_replica():
+    replica = ClientReplica()
+    if not replica.names():
+        # Primera ejecución con la réplica vacía: la carga inicial sí se hace en primer plano.
+        # El error queda en last_error y lo muestra la vista (lo que se dibuja dentro de
+        # cache_resource se repetiría en todas las ejecuciones)
+        try:
+            replica.sync()
+        except Exception as e:
+            replica.last_error = f"{type(e).__name__}: {e}"
+            print(f"⚠️ No se pudo cargar la lista de clientes ({replica.last_error}).")
+    return replica.start()
+
+@lru_cache(maxsize=2)
+def _client_index(replica, version):
+    return ClientIndex(replica.names())
+
+def get_client_index():
+    # Se reconstruye solo cuando cambia la versión de la réplica (sync o cliente nuevo)
+    replica = get_client_replica()
+    return _client_index(replica, replica.version)
+
+def client_exists(name):
+    return name in get_client_replica()
+
+def add_client(name):
+    return get_client_replica().add(name)
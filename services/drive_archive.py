@@ -0,0 +1,160 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+
+import pytz
+import streamlit as st
+from googleapiclient.http import MediaIoBaseUpload
+
+from services.tracing import correlated, correlation_id, span
+from services.utils import get_drive_service
+
+ROOT_FOLDER_NAME = "Solicitudes de Anticipo"
+FOLDER_MIME = "application/vnd.google-apps.folder"
+WORKERS = 2
+MAX_PENDING = 50
+CHUNK_SIZE = 1024 * 1024
+NUM_RETRIES = 5
+# Hashes de PDFs ya subidos que se recuerdan en memoria; los más viejos se vuelven a
+# encontrar en Drive por su appProperties
+UPLOADED_CACHE = 10_000
+# Las carpetas por fecha siguen el día de Colombia, no el del servidor
+TIMEZONE = pytz.timezone("America/Bogota")
+
+# Archivo de los PDFs generados en Drive: <raíz>/<AAAA-MM-DD>/<comercial>/<archivo>.pdf.
+# Las subidas corren en un pool de hilos acotado (nunca en el hilo de Streamlit), usan
+# subida resumible por partes y se deduplican por el sha256 del PDF, que queda guardado en
+# las appProperties del archivo. El servicio de Drive se inyecta (service_factory), así que
+# se puede probar con un Drive falso local (tests/fake_drive.py).
+
+def _quote(value):
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+def pdf_filename(no_solicitud, client):
+    name = f"Solicitud {no_solicitud or 'sin número'} - {client or 'sin cliente'}".strip()
+    return re.sub(r'[\\/:*?"<>|]+', "_", name) + ".pdf"
+
+class DriveArchiver:
+    def __init__(self, service_factory=get_drive_service, root_folder_id=None, workers=WORKERS, max_pending=MAX_PENDING):
+        self.service_factory = service_factory
+        self.root_folder_id = root_folder_id
+
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="drive-upload")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._folders = {}
+        self._uploaded = OrderedDict()
+        self.uploads = 0
+        self.duplicates = 0
+        self.failures = 0
+        self.last_error = None
+
+    def submit(self, pdf_bytes, filename, commercial, date=None):
+        # No bloquea: si ya hay MAX_PENDING subidas en cola, esta se descarta con aviso
+        if not self._slots.acquire(blocking=False):
+            print(f"⚠️ Cola de subidas a Drive llena; no se archivó '{filename}'.")
+            return None
+
+        date = date or datetime.now(TIMEZONE).strftime("%Y-%m-%d")
+        future = self._pool.submit(self._traced_upload, correlation_id(), pdf_bytes, filename, commercial, date)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+    def _remember(self, digest, file_id):
+        # LRU acotado; se llama con el lock tomado
+        self._uploaded[digest] = file_id
+        self._uploaded.move_to_end(digest)
+        while len(self._uploaded) > UPLOADED_CACHE:
+            self._uploaded.popitem(last=False)
+
+    def _find(self, service, query):
+        response = service.files().list(
+            q=f"{query} and trashed = false", fields="files(id, name)", pageSize=1,
+            supportsAllDrives=True, includeItemsFromAllDrives=True,
+        ).execute(num_retries=NUM_RETRIES)
+        files = response.get("files", [])
+        return files[0]["id"] if files else None
+
+    def _folder(self, service, name, parent):
+        key = (parent, name)
+        with self._lock:
+            if key in self._folders:
+                return self._folders[key]
+
+        parent_query = f" and '{parent}' in parents" if parent else " and 'root' in parents"
+        folder_id = self._find(service, f"name = '{_quote(name)}' and mimeType = '{FOLDER_MIME}'{parent_query}")
+        if folder_id is None:
+            body = {"name": name, "mimeType": FOLDER_MIME}
+            if parent:
+                body["parents"] = [parent]
+            folder_id = service.files().create(
+                body=body, fields="id", supportsAllDrives=True
+            ).execute(num_retries=NUM_RETRIES)["id"]
+
+        with self._lock:
+            # Si otro hilo creó la misma carpeta a la vez se queda la primera registrada
+            return self._folders.setdefault(key, folder_id)
+
+    def _traced_upload(self, cid, *args):
+        with correlated(cid), span("drive.upload"):
+            return self._upload(*args)
+
+    def _upload(self, pdf_bytes, filename, commercial, date):
+        digest = hashlib.sha256(pdf_bytes).hexdigest()
+        try:
+            with self._lock:
+                if digest in self._uploaded:
+                    self._uploaded.move_to_end(digest)
+                    self.duplicates += 1
+                    return self._uploaded[digest]
+
+            service = self.service_factory()
+
+            existing = self._find(service, f"appProperties has {{ key='sha256' and value='{digest}' }}")
+            if existing:
+                with self._lock:
+                    self._remember(digest, existing)
+                    self.duplicates += 1
+                return existing
+
+            root = self.root_folder_id or self._folder(service, ROOT_FOLDER_NAME, None)
+            folder = self._folder(service, commercial or "Sin comercial", self._folder(service, date, root))
+
+            media = MediaIoBaseUpload(BytesIO(pdf_bytes), mimetype="application/pdf", chunksize=CHUNK_SIZE, resumable=True)
+            request = service.files().create(
+                body={"name": filename, "parents": [folder], "appProperties": {"sha256": digest}},
+                media_body=media,
+                fields="id",
+                supportsAllDrives=True,
+            )
+
+            response = None
+            while response is None:
+                status, response = request.next_chunk(num_retries=NUM_RETRIES)
+
+            with self._lock:
+                self._remember(digest, response["id"])
+                self.uploads += 1
+            return response["id"]
+
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+            print(f"⚠️ No se pudo archivar '{filename}' en Drive ({self.last_error}).")
+            return None
+
+@st.cache_resource(show_spinner=False)
+def get_drive_archiver():
+    # Carpeta raíz opcional: general.drive_folder_id en los secrets
+    return DriveArchiver(root_folder_id=st.secrets.get("general", {}).get("drive_folder_id"))
+
+def archive_pdf(pdf_bytes, request):
+    return get_drive_archiver().submit(pdf_bytes, pdf_filename(request.no_solicitud, request.client), request.commercial)
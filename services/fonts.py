@@ -0,0 +1,163 @@
+"""Fuentes OpenSauce del PDF: registro perezoso, tabla de anchos y subset Latin-1 precalculados.
+
+Los archivos de resources/fonts/cache se generan con (desde la raíz del repositorio):
+
+    python -m services.fonts
+
+Si faltan o no corresponden al .ttf / a la versión de ReportLab instalada, se calculan en
+memoria la primera vez que se usan.
+"""
+import hashlib
+import json
+import os
+import threading
+import zlib
+
+import reportlab
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfdoc import PDFArray, PDFName
+from reportlab.pdfbase.ttfonts import TTFont
+
+FONTS = {
+    "OpenSauce": "resources/fonts/OpenSauceSans-Regular.ttf",
+    "OpenSauceBold": "resources/fonts/OpenSauceSans-Bold.ttf",
+}
+CACHE_DIR = "resources/fonts/cache"
+
+# Latin-1 imprimible: ASCII (ya fijo en el subset 0 de ReportLab) más ¡..ÿ para el español
+LATIN_EXTRA = "".join(chr(code) for code in range(0xA1, 0x100))
+CHARSET = "".join(chr(code) for code in range(0x20, 0x7F)) + LATIN_EXTRA
+
+# Cada documento de ReportLab arma sus propios subsets con los caracteres en el orden en que
+# aparecen, así que el subset (y su compresión) cambia de un PDF a otro. LatinTTFont asigna
+# todo Latin-1 en un orden fijo al empezar cada documento: el subset 0 es siempre el mismo,
+# se construye y comprime una vez por proceso (o se lee ya listo del disco) y los PDFs que
+# se estampan juntos (capas del template y overlay) llevan exactamente el mismo programa de
+# fuente, que _stamp puede compartir en vez de repetir.
+
+_lock = threading.RLock()
+_registered = False
+_metrics = {}
+
+def _digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _cache_paths(name):
+    return os.path.join(CACHE_DIR, f"{name}.json"), os.path.join(CACHE_DIR, f"{name}.subset.zlib")
+
+class _Document:
+    # TTFont.state es un WeakKeyDictionary: hace falta un objeto con weakref como "documento"
+    pass
+
+class LatinTTFont(TTFont):
+    def __init__(self, name, filename, subset=None):
+        super().__init__(name, filename)
+        self._subsets = dict(subset or {})
+
+        make_subset = self.face.makeSubset
+        add_subset_objects = self.face.addSubsetObjects
+
+        def cached_subset(subset):
+            key = tuple(subset)
+            if key not in self._subsets:
+                data = make_subset(subset)
+                self._subsets[key] = (data, zlib.compress(data))
+            return self._subsets[key][0]
+
+        def add_precompressed(doc, fontname, subset):
+            # Mismo FontDescriptor de ReportLab, pero el FontFile2 va ya comprimido
+            reference = add_subset_objects(doc, fontname, subset)
+            stream = doc.idToObject.get(f"fontFile:{self.face.filename}({fontname})")
+            compressed = self._subsets.get(tuple(subset), (None, None))[1]
+            if stream is not None and compressed is not None and doc.compression:
+                stream.content = compressed
+                stream.dictionary["Filter"] = PDFArray([PDFName("FlateDecode")])
+            return reference
+
+        self.face.makeSubset = cached_subset
+        self.face.addSubsetObjects = add_precompressed
+
+    def splitString(self, text, doc, encoding="utf-8"):
+        if doc not in self.state:
+            super().splitString(LATIN_EXTRA, doc)
+        return super().splitString(text, doc, encoding)
+
+    def latin_subset(self):
+        # Subset 0 con Latin-1 completo, tal como queda en cualquier documento
+        doc = _Document()
+        self.splitString("", doc)
+        return tuple(self.state[doc].subsets[0])
+
+def build_cache(name, path):
+    font = LatinTTFont(name, path)
+    subset = font.latin_subset()
+    data = font.face.makeSubset(list(subset))
+    metrics = {
+        "source_sha256": _digest(path),
+        "reportlab": reportlab.Version,
+        "subset": list(subset),
+        "widths": {char: font.face.charWidths.get(ord(char), font.face.defaultWidth) for char in CHARSET},
+    }
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    metrics_path, subset_path = _cache_paths(name)
+    with open(metrics_path, "w", encoding="utf-8") as f:
+        json.dump(metrics, f, ensure_ascii=False, sort_keys=True)
+    with open(subset_path, "wb") as f:
+        f.write(zlib.compress(data))
+    return metrics
+
+def _load_cache(name, path):
+    # Tabla y subset del disco, solo si corresponden a este .ttf y a esta versión de ReportLab
+    metrics_path, subset_path = _cache_paths(name)
+    try:
+        with open(metrics_path, encoding="utf-8") as f:
+            metrics = json.load(f)
+        with open(subset_path, "rb") as f:
+            compressed = f.read()
+    except (OSError, ValueError):
+        return None, None
+    if metrics.get("source_sha256") != _digest(path) or metrics.get("reportlab") != reportlab.Version:
+        return None, None
+    return metrics, {tuple(metrics["subset"]): (zlib.decompress(compressed), compressed)}
+
+def font_metrics(name):
+    # Anchos en unidades de 1/1000 por carácter Latin-1, o None si la fuente no es nuestra
+    if name not in FONTS:
+        return None
+    if name not in _metrics:
+        with _lock:
+            if name not in _metrics:
+                path = FONTS[name]
+                metrics = _load_cache(name, path)[0] if os.path.exists(path) else None
+                if metrics is None:
+                    ensure_fonts()
+                    face = pdfmetrics.getFont(name).face if name in pdfmetrics.getRegisteredFontNames() else None
+                    metrics = {"widths": {char: face.charWidths.get(ord(char), face.defaultWidth) for char in CHARSET}} if face else {"widths": {}}
+                _metrics[name] = metrics["widths"]
+    return _metrics[name]
+
+def ensure_fonts():
+    # Registro perezoso: el .ttf se lee en el primer render, no al importar write_pdf
+    global _registered
+    if _registered:
+        return
+    with _lock:
+        if _registered:
+            return
+        for name, path in FONTS.items():
+            if not os.path.exists(path):
+                print(f"⚠️ Advertencia: La fuente '{name}' no se encontró en {path}.")
+                continue
+            subset = _load_cache(name, path)[1]
+            pdfmetrics.registerFont(LatinTTFont(name, path, subset))
+        _registered = True
+
+def main():
+    for name, path in FONTS.items():
+        metrics = build_cache(name, path)
+        print(f"{name}: {len(metrics['subset'])} glifos en el subset, {len(metrics['widths'])} anchos -> {CACHE_DIR}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 300.0
+
+# Piezas comunes de los registros locales que se copian a Google Sheets (cola de filas,
+# solicitudes, clientes): la conexión a SQLite y el hilo que reintenta con backoff.
+
+@contextmanager
+def connect(path):
+    # Autocommit (las transacciones se abren a mano con BEGIN) y WAL: la UI escribe mientras
+    # el hilo de sincronización lee
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        yield connection
+    finally:
+        connection.close()
+
+def backoff_delay(failures):
+    # Exponencial con jitter, para que varios procesos no reintenten todos a la vez
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** failures) * random.uniform(0.5, 1.5)
+
+class SyncWorker:
+    # Hilo en segundo plano que llama a sync_once cada flush_interval segundos o en cuanto
+    # lo despiertan (_wake). Si falla, llama a reset (p. ej. para volver a abrir la hoja) y
+    # reintenta con backoff hasta que vuelva a funcionar.
+    thread_name = "sync-worker"
+    failure_message = "No se pudo sincronizar con Google Sheets"
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self.failures = 0
+        self.last_error = None
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sync_once(self):
+        raise NotImplementedError
+
+    def reset(self):
+        pass
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+        return self
+
+    def _join(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        delay = self.flush_interval
+        while not self._stop.is_set():
+            self._wake.wait(delay)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+
+            try:
+                self.sync_once()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.reset()
+                delay = backoff_delay(self.failures)
+                print(f"⚠️ {self.failure_message} ({self.last_error}). Reintento en {delay:.0f}s.")
+            else:
+                self.failures = 0
+                self.last_error = None
+                delay = self.flush_interval
@@ -0,0 +1,201 @@
+import json
+from dataclasses import InitVar, dataclass, field
+from datetime import datetime
+
+from services.surcharge_ledger import SurchargeLedger, parse_sheet_lines
+
+# Modelos de la solicitud de anticipo. Los valores se validan y normalizan una sola vez al
+# crear el objeto; después se serializan directo a la fila de Sheets, al dict que dibuja el
+# overlay del PDF o a JSON, sin volver a recorrer listas anidadas.
+
+def _text(value):
+    return "" if value is None else str(value)
+
+def _flatten(values):
+    # Igual que la fila original: una lista anidada se aplana en el mismo orden
+    flat = []
+    for value in values or ():
+        if isinstance(value, (list, tuple)):
+            flat.extend(_text(item) for item in value)
+        else:
+            flat.append(_text(value))
+    return tuple(flat)
+
+def _trm(value):
+    # value != value: NaN de una celda vacía leída con pandas
+    if value in (None, "", "None") or value != value:
+        return None
+    return float(value)
+
+def issue_date_from(value):
+    # Fecha que se imprime en el PDF (dd/mm/aaaa) a partir de la hora guardada en la hoja
+    if hasattr(value, "strftime"):
+        return "" if value != value else value.strftime("%d/%m/%Y")
+    try:
+        return datetime.strptime(str(value).strip()[:10], "%Y-%m-%d").strftime("%d/%m/%Y")
+    except ValueError:
+        return ""
+
+@dataclass(slots=True)
+class Surcharge:
+    concept: str = ""
+    currency: str = ""
+    cost: float = 0.0
+    # Solo para el editor: identifica la fila en las llaves de sus widgets
+    id: int = 0
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(_text(data.get("concept", "")), _text(data.get("currency", "USD")), data.get("cost", 0))
+
+    def validated(self):
+        # Las filas ya validadas (sin id de editor) se usan tal cual
+        if not self.id and type(self.cost) is float and self.cost >= 0 and type(self.concept) is str and type(self.currency) is str:
+            return self
+        try:
+            cost = float(self.cost)
+        except (TypeError, ValueError):
+            raise ValueError(f"Costo inválido para el recargo '{self.concept}': {self.cost!r}")
+        if cost < 0:
+            raise ValueError(f"El costo del recargo '{self.concept}' no puede ser negativo.")
+        return Surcharge(_text(self.concept), _text(self.currency), cost)
+
+    def to_dict(self):
+        return {"concept": self.concept, "currency": self.currency, "cost": self.cost}
+
+@dataclass(slots=True)
+class SolicitudRequest:
+    no_solicitud: str = ""
+    commercial: str = ""
+    client: str = ""
+    customer_name: str = ""
+    customer_phone: str = ""
+    customer_email: str = ""
+    container_type: tuple = ()
+    transport_type: tuple = ()
+    operation_type: str = ""
+    reference: str = ""
+    # contenedor -> recargos, en el orden del formulario
+    surcharges: dict = field(default_factory=dict)
+    trm: float | None = None
+    total_cop_trm: str = ""
+    # Fecha impresa (dd/mm/aaaa); vacía es la fecha del día en que se genera el PDF
+    issue_date: str = ""
+    # Libro ya calculado para estos mismos recargos (p. ej. el del editor); si no, se arma al pedirlo
+    ledger: InitVar[SurchargeLedger | None] = None
+    _ledger: SurchargeLedger | None = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self, ledger):
+        for name in ("no_solicitud", "commercial", "client", "customer_name", "customer_phone",
+                     "customer_email", "operation_type", "reference", "total_cop_trm", "issue_date"):
+            setattr(self, name, _text(getattr(self, name)))
+
+        self.container_type = _flatten(self.container_type)
+        self.transport_type = _flatten(self.transport_type)
+        self.trm = _trm(self.trm)
+        # Copias validadas: el editor puede seguir modificando sus filas sin tocar la solicitud
+        self.surcharges = {
+            _text(container): tuple(surcharge.validated() for surcharge in surcharges)
+            for container, surcharges in (self.surcharges or {}).items()
+        }
+        self._ledger = ledger
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            no_solicitud=data.get("no_solicitud", ""),
+            commercial=data.get("commercial", ""),
+            client=data.get("client", ""),
+            customer_name=data.get("customer_name", ""),
+            customer_phone=data.get("customer_phone", ""),
+            customer_email=data.get("customer_email", ""),
+            container_type=data.get("container_type", ()),
+            transport_type=data.get("transport_type", ()),
+            operation_type=data.get("operation_type", ""),
+            reference=data.get("reference", ""),
+            surcharges={
+                container: [Surcharge.from_dict(surcharge) for surcharge in surcharges]
+                for container, surcharges in (data.get("additional_surcharges") or {}).items()
+            },
+            trm=data.get("trm"),
+            total_cop_trm=data.get("total_cop_trm", ""),
+            issue_date=data.get("issue_date", ""),
+        )
+
+    @classmethod
+    def from_sheet_row(cls, row, no_solicitud=""):
+        # Inverso de to_sheet_row. Las filas anteriores a la columna del número de operación no
+        # lo traen, así que se puede pasar aparte; la fecha del PDF es la de la fila y los
+        # recargos salen de sus líneas de texto.
+        row = list(row) + [""] * (17 - len(row))
+        surcharges = {}
+        for container, concept, currency, cost in parse_sheet_lines(row[10]):
+            surcharges.setdefault(container, []).append(Surcharge(concept, currency, cost))
+
+        return cls(
+            no_solicitud=no_solicitud or row[16],
+            commercial=row[0],
+            client=row[2],
+            customer_name=row[3],
+            customer_phone=row[4],
+            customer_email=row[5],
+            container_type=_text(row[6]).splitlines(),
+            transport_type=_text(row[7]).splitlines(),
+            operation_type=row[8],
+            reference=row[9],
+            surcharges=surcharges,
+            trm=row[13],
+            total_cop_trm=row[14],
+            issue_date=issue_date_from(row[1]),
+        )
+
+    @property
+    def surcharge_ledger(self):
+        if self._ledger is None:
+            self._ledger = SurchargeLedger.from_records(
+                (container, surcharge.concept, surcharge.currency, surcharge.cost)
+                for container, surcharges in self.surcharges.items()
+                for surcharge in surcharges
+            )
+        return self._ledger
+
+    def to_dict(self):
+        return {
+            "no_solicitud": self.no_solicitud,
+            "commercial": self.commercial,
+            "client": self.client,
+            "customer_name": self.customer_name,
+            "customer_phone": self.customer_phone,
+            "customer_email": self.customer_email,
+            "container_type": list(self.container_type),
+            "transport_type": list(self.transport_type),
+            "operation_type": self.operation_type,
+            "reference": self.reference,
+            "additional_surcharges": {
+                container: [surcharge.to_dict() for surcharge in surcharges]
+                for container, surcharges in self.surcharges.items()
+            },
+            "trm": self.trm,
+            "total_cop_trm": self.total_cop_trm,
+            "issue_date": self.issue_date,
+        }
+
+    # create_overlay / generate_pdf leen el mismo formato de dict que el lote y los JSON
+    to_overlay = to_dict
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    def to_sheet_row(self, end_time_str, request_id=""):
+        # request_id: id del registro local (services.request_store), para no duplicar filas
+        ledger = self.surcharge_ledger
+        return [
+            self.commercial, end_time_str, self.client, self.customer_name, self.customer_phone, self.customer_email,
+            "\n".join(self.container_type), "\n".join(self.transport_type), self.operation_type, self.reference,
+            ledger.sheet_lines(), ledger.total("USD"), ledger.total("COP"), self.trm, self.total_cop_trm, request_id,
+            self.no_solicitud,
+        ]
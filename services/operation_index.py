@@ -0,0 +1,106 @@
+import json
+import sqlite3
+import threading
+import time
+
+import gspread
+import streamlit as st
+
+from services.request_history import COLUMNS, HISTORY_SHEET
+from services.request_store import REQUESTS_PATH
+from services.tracing import span
+from services.utils import get_spreadsheet
+
+SYNC_INTERVAL = 60
+OPERATION_COLUMN = chr(ord("A") + COLUMNS.index("no_solicitud"))
+
+# Índice de números de operación ya enviados, para avisar de un duplicado antes de guardar.
+# La consulta es un set en memoria; se llena con el registro local (data/requests.db) y con
+# la columna "Operation Number" de la hoja, que un hilo en segundo plano lee de forma
+# incremental (solo las filas después de la última revisada).
+
+def normalize_operation(value):
+    # "m 1234 " y "M1234" son el mismo número de operación
+    return "".join(str(value or "").split()).upper()
+
+class OperationIndex:
+    def __init__(self, open_spreadsheet=get_spreadsheet, sheet_name=HISTORY_SHEET, store_path=REQUESTS_PATH, sync_interval=SYNC_INTERVAL):
+        self.open_spreadsheet = open_spreadsheet
+        self.sheet_name = sheet_name
+        self.sync_interval = sync_interval
+        self.last_row = 1
+        self.last_sync = None
+        self.last_error = None
+
+        self._operations = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._load_store(store_path)
+
+    def _load_store(self, path):
+        # Solicitudes guardadas en este servidor, aunque todavía no estén en la hoja
+        try:
+            connection = sqlite3.connect(path, timeout=30)
+            try:
+                rows = connection.execute("SELECT request FROM requests").fetchall()
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            return
+        for (request,) in rows:
+            self.add(json.loads(request).get("no_solicitud"))
+
+    def __len__(self):
+        return len(self._operations)
+
+    def __contains__(self, value):
+        return normalize_operation(value) in self._operations
+
+    def add(self, value):
+        key = normalize_operation(value)
+        if key:
+            with self._lock:
+                self._operations.add(key)
+
+    def sync(self):
+        with span("operations.sync"):
+            try:
+                worksheet = self.open_spreadsheet().worksheet(self.sheet_name)
+            except gspread.exceptions.WorksheetNotFound:
+                return 0
+
+            # Una sola columna desde la última fila revisada; las filas viejas la traen vacía
+            values = worksheet.get(f"{OPERATION_COLUMN}{self.last_row + 1}:{OPERATION_COLUMN}", value_render_option="UNFORMATTED_VALUE")
+            keys = {normalize_operation(cells[0]) for cells in values if cells}
+            keys.discard("")
+            with self._lock:
+                added = len(keys - self._operations)
+                self._operations |= keys
+            self.last_row += len(values)
+            self.last_sync = time.time()
+            return added
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="operations-sync", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sync()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"⚠️ No se pudo actualizar el índice de números de operación ({self.last_error}).")
+            self._stop.wait(self.sync_interval)
+
+@st.cache_resource(show_spinner=False)
+def get_operation_index():
+    return OperationIndex().start()
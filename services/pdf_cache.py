@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import streamlit as st
+
+from services.models import SolicitudRequest
+from services.tracing import span
+from services.user_directory import user_data
+from services.write_pdf import TEMPLATE_PATH, generate_pdf
+
+# Cambiar cuando cambie lo que dibuja create_overlay / las capas del template, para que no se
+# sirvan PDFs armados con el diseño anterior.
+LAYOUT_VERSION = 5
+
+MEMORY_BYTES = 64 * 1024 * 1024
+DISK_BYTES = 512 * 1024 * 1024
+
+# Caché de PDFs generados, direccionada por contenido: la llave es un sha256 de la solicitud
+# normalizada, la versión del template (ruta, mtime, tamaño y firma del comercial) y la fecha
+# que se imprime. Una solicitud repetida devuelve los mismos bytes sin volver a dibujar nada.
+
+def cache_key(request, template_path=TEMPLATE_PATH):
+    stat = os.stat(template_path)
+    payload = {
+        "layout": LAYOUT_VERSION,
+        "request": request.to_dict(),
+        "template": [os.path.abspath(template_path), stat.st_mtime_ns, stat.st_size],
+        "signature": user_data(request.commercial),
+        "date": request.issue_date or datetime.today().strftime("%d/%m/%Y"),
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+class PdfCache:
+    def __init__(self, max_bytes=MEMORY_BYTES, disk_dir=None, disk_max_bytes=DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pdf")
+
+    def _remember(self, key, data):
+        # LRU acotado por bytes; se llama con el lock tomado
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        if len(data) > self.max_bytes:
+            return
+        self._entries[key] = data
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                pass
+            else:
+                os.utime(self._disk_path(key))
+                with self._lock:
+                    self._remember(key, data)
+                    self.disk_hits += 1
+                return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data):
+        with self._lock:
+            self._remember(key, data)
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            temporary = f"{path}.{threading.get_ident()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(data)
+            os.replace(temporary, path)
+            self._prune_disk()
+
+    def _prune_disk(self):
+        # Se borran los menos usados (mtime más viejo) hasta quedar por debajo del límite
+        entries = []
+        total = 0
+        with os.scandir(self.disk_dir) as files:
+            for entry in files:
+                if entry.name.endswith(".pdf"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+@st.cache_resource(show_spinner=False)
+def get_pdf_cache():
+    # El disco es opcional: se activa con general.pdf_cache_dir en los secrets
+    disk_dir = st.secrets.get("general", {}).get("pdf_cache_dir")
+    return PdfCache(disk_dir=disk_dir)
+
+def cached_generate_pdf(data, template_path=TEMPLATE_PATH, cache=None):
+    # Se dibuja desde la solicitud normalizada: la llave y el PDF salen de los mismos datos
+    request = data if isinstance(data, SolicitudRequest) else SolicitudRequest.from_dict(data)
+    if cache is None:
+        cache = get_pdf_cache()
+
+    key = cache_key(request, template_path)
+    pdf_bytes = cache.get(key)
+    if pdf_bytes is None:
+        with span("pdf.render"):
+            pdf_bytes = generate_pdf(request, template_path)
+        cache.put(key, pdf_bytes)
+    return pdf_bytes
@@ -0,0 +1,73 @@
+"""Regenera PDFs de solicitudes ya enviadas a partir de sus filas en la hoja.
+
+Uso desde la raíz del repositorio (fechas inclusivas, AAAA-MM-DD):
+
+    python -m services.reconstruct --from 2025-01-01 --to 2025-01-31 -o enero.zip --workers 4
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from services.batch_pdf import generate_batch
+from services.models import SolicitudRequest, issue_date_from
+from services.request_history import COLUMNS, RequestHistory
+from services.request_store import RequestStore
+from services.trm_rates import TRMRates, fill_trm
+from services.write_pdf import TEMPLATE_PATH
+
+def request_from_record(record, no_solicitud="", store=None, rates=None):
+    # record: una fila del historial (services.request_history), con las columnas de la hoja.
+    # Si la solicitud está en el registro local se usa esa (trae el número de operación).
+    # Con rates (services.trm_rates), las filas viejas sin TRM toman la de su fecha.
+    request = None
+    if store is not None and str(record.get("request_id", "")).strip():
+        try:
+            request = store.get(int(float(record["request_id"])))
+        except ValueError:
+            pass
+    if request is None:
+        request = SolicitudRequest.from_sheet_row([record[column] for column in COLUMNS], no_solicitud)
+    else:
+        if no_solicitud:
+            request.no_solicitud = no_solicitud
+        # La fecha impresa es la del envío original, como en las filas sin registro local
+        request.issue_date = request.issue_date or issue_date_from(record["time"])
+    return fill_trm(request, rates)
+
+def records_between(index, start=None, end=None):
+    # end es inclusivo hasta el final del día
+    if end is not None:
+        end = datetime.combine(end, datetime.min.time()) + timedelta(days=1) - timedelta(microseconds=1)
+    return index.page(index.between(start, end), 1, len(index.frame)).to_dict("records")
+
+def reconstruct_batch(records, output, template_path=TEMPLATE_PATH, workers=None, store=None, rates=None):
+    # Mismo lote en paralelo que services.batch_pdf; cada PDF lleva la fecha de su fila
+    requests = (request_from_record(record, store=store, rates=rates).to_dict() for record in records)
+    return generate_batch(requests, output, template_path, workers)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat, default=None)
+    parser.add_argument("-o", "--output", default="solicitudes.zip")
+    parser.add_argument("--template", default=TEMPLATE_PATH)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    # Fuera de Streamlit no hay caché de recursos: una lectura por rangos de toda la hoja
+    history = RequestHistory()
+    history.refresh()
+    records = records_between(history.index, args.start, args.end)
+
+    with open(args.output, "wb") as output:
+        summary = reconstruct_batch(records, output, args.template, args.workers, store=RequestStore(), rates=TRMRates(source=None))
+
+    print(
+        f"{summary['documents']} PDFs de {len(records)} filas en {summary['seconds']}s con "
+        f"{summary['workers']} procesos -> {args.output}"
+    )
+    for error in summary["errors"]:
+        print(f"⚠️ {error['file']}: {error['error']}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import threading
+import time
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from services.client_index import ClientIndex, normalize
+from services.utils import get_spreadsheet
+
+HISTORY_SHEET = "SOLICITUD DE ANTICIPO"
+BLOCK_ROWS = 1000
+BLOCKS_PER_READ = 5
+REFRESH_INTERVAL = 120
+CLIENT_MATCHES = 200
+
+# Columnas en el orden en que SolicitudRequest.to_sheet_row escribe la fila
+COLUMNS = [
+    "commercial", "time", "client", "customer_name", "customer_phone", "customer_email", "container_type",
+    "transport_type", "operation_type", "reference", "surcharges", "total_usd", "total_cop", "trm", "total_cop_trm",
+    "request_id", "no_solicitud",
+]
+LAST_COLUMN = chr(ord("A") + len(COLUMNS) - 1)
+
+# Historial de solicitudes leído de la hoja principal. La hoja se lee por rangos (varios
+# bloques de filas por llamada a batch_get) y después solo se traen las filas nuevas. Los
+# filtros corren sobre índices construidos una vez por carga: posiciones por comercial y por
+# cliente, y las fechas ordenadas para buscar un rango con searchsorted.
+
+SHEETS_EPOCH = pd.Timestamp("1899-12-30")
+
+def _times(values):
+    # Las filas de la app son texto "AAAA-MM-DD HH:MM:SS"; las escritas a mano en la hoja
+    # pueden venir como número de serie de Sheets (días desde 1899-12-30)
+    text = pd.to_datetime(values.where(values.map(lambda value: isinstance(value, str))), format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    serial = pd.to_numeric(values.where(values.map(lambda value: isinstance(value, (int, float)))), errors="coerce")
+    return text.fillna(SHEETS_EPOCH + pd.to_timedelta(serial, unit="D"))
+
+def _frame(rows):
+    # rows: tuplas (fila de la hoja, valores)
+    frame = pd.DataFrame([(values + [""] * len(COLUMNS))[:len(COLUMNS)] for _, values in rows], columns=COLUMNS, dtype=object)
+    frame.insert(0, "sheet_row", pd.Series([number for number, _ in rows], dtype="int64"))
+    frame["time"] = _times(frame["time"])
+    for column in ("total_usd", "total_cop", "trm"):
+        frame[column] = pd.to_numeric(frame[column].replace("", None), errors="coerce").astype("float64")
+    for column in COLUMNS:
+        if frame[column].dtype == object:
+            frame[column] = frame[column].map(lambda value: "" if value is None else str(value))
+    return frame
+
+class HistoryIndex:
+    def __init__(self, frame):
+        self.frame = frame
+
+    @cached_property
+    def by_commercial(self):
+        return {name: np.asarray(positions) for name, positions in self.frame.groupby("commercial", sort=True).indices.items()}
+
+    @cached_property
+    def by_client(self):
+        return self.frame.groupby(self.frame["client"].map(normalize), sort=False).indices
+
+    @cached_property
+    def clients(self):
+        # Buscador de clientes (prefijo, palabra, aproximado) sobre los nombres distintos del historial
+        return ClientIndex(self.frame["client"].drop_duplicates().tolist())
+
+    @cached_property
+    def _dates(self):
+        times = self.frame["time"]
+        valid = np.flatnonzero(times.notna().to_numpy())
+        values = times.to_numpy()[valid].astype("datetime64[ns]").astype(np.int64)
+        order = np.argsort(values, kind="stable")
+        return values[order], valid[order]
+
+    def commercials(self):
+        return list(self.by_commercial)
+
+    def between(self, start=None, end=None):
+        # end es inclusivo; None deja el extremo abierto
+        values, positions = self._dates
+        low = 0 if start is None else np.searchsorted(values, pd.Timestamp(start).value, side="left")
+        high = len(values) if end is None else np.searchsorted(values, pd.Timestamp(end).value, side="right")
+        return np.sort(positions[low:high])
+
+    def filter(self, commercials=None, client_query="", start=None, end=None):
+        # Posiciones que cumplen todos los filtros, de la más reciente a la más antigua
+        selected = None
+
+        def narrow(positions):
+            return positions if selected is None else np.intersect1d(selected, positions, assume_unique=True)
+
+        if commercials:
+            selected = narrow(np.unique(np.concatenate([self.by_commercial.get(name, np.empty(0, dtype=np.intp)) for name in commercials])))
+
+        if client_query.strip():
+            # Coincidencias exactas o por prefijo; lo aproximado solo si no hay ninguna, para que
+            # un nombre completo no traiga a todos los clientes que comparten una palabra
+            matches = self.clients.search(client_query, limit=CLIENT_MATCHES, fuzzy=False)
+            if not matches:
+                matches = self.clients.search(client_query, limit=CLIENT_MATCHES)
+            positions = [self.by_client[normalize(name)] for name in matches]
+            selected = narrow(np.unique(np.concatenate(positions)) if positions else np.empty(0, dtype=np.intp))
+
+        if start is not None or end is not None:
+            selected = narrow(self.between(start, end))
+
+        if selected is None:
+            selected = np.arange(len(self.frame))
+        return selected[::-1]
+
+    def page(self, positions, page, page_size):
+        # Solo se materializan las filas de la página visible
+        start = (page - 1) * page_size
+        return self.frame.iloc[positions[start:start + page_size]]
+
+class RequestHistory:
+    def __init__(self, open_spreadsheet=get_spreadsheet, sheet_name=HISTORY_SHEET, block_rows=BLOCK_ROWS, blocks_per_read=BLOCKS_PER_READ):
+        self.open_spreadsheet = open_spreadsheet
+        self.sheet_name = sheet_name
+        self.block_rows = block_rows
+        self.blocks_per_read = blocks_per_read
+        self.last_row = 1
+        self.last_refresh = None
+        self.reads = 0
+        self.index = HistoryIndex(_frame([]))
+        self._lock = threading.Lock()
+
+    def _read_rows(self, worksheet, start_row):
+        # Bloques de filas consecutivos en una sola llamada, sin pasarse del tamaño de la hoja.
+        # Devuelve (número de fila, valores) y la última fila leída con datos.
+        rows = []
+        last_row = start_row - 1
+        while last_row < worksheet.row_count:
+            ranges = []
+            first = last_row + 1
+            for _ in range(self.blocks_per_read):
+                if first > worksheet.row_count:
+                    break
+                end = min(first + self.block_rows - 1, worksheet.row_count)
+                ranges.append((first, end))
+                first = end + 1
+
+            blocks = worksheet.batch_get(
+                [f"A{first}:{LAST_COLUMN}{end}" for first, end in ranges], value_render_option="UNFORMATTED_VALUE"
+            )
+            self.reads += 1
+
+            for (first, end), values in zip(ranges, blocks):
+                values = list(values)
+                rows.extend(enumerate(values, start=first))
+                if values:
+                    last_row = first + len(values) - 1
+                # La API recorta las filas vacías del final: un bloque incompleto es el último
+                if len(values) < end - first + 1:
+                    return rows, last_row
+            last_row = ranges[-1][1]
+        return rows, last_row
+
+    def refresh(self):
+        with self._lock:
+            # worksheet() vuelve a leer los metadatos, así row_count incluye las filas agregadas
+            worksheet = self.open_spreadsheet().worksheet(self.sheet_name)
+            rows, last_row = self._read_rows(worksheet, self.last_row + 1)
+            rows = [(number, values) for number, values in rows if any(str(value).strip() for value in values)]
+
+            if rows:
+                frame = pd.concat([self.index.frame, _frame(rows)], ignore_index=True) if len(self.index.frame) else _frame(rows)
+                self.index = HistoryIndex(frame)
+            self.last_row = max(self.last_row, last_row)
+            self.last_refresh = time.time()
+            return len(rows)
+
+    def current(self, max_age=REFRESH_INTERVAL):
+        if self.last_refresh is None or time.time() - self.last_refresh > max_age:
+            self.refresh()
+        return self.index
+
+@st.cache_resource(show_spinner=False)
+def get_request_history():
+    return RequestHistory()
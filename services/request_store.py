@@ -0,0 +1,154 @@
+import json
+import os
+import time
+
+import gspread
+import streamlit as st
+
+from services.models import SolicitudRequest
+from services.request_history import COLUMNS, HISTORY_SHEET
+from services.local_sync import SyncWorker, connect
+from services.sheet_queue import BATCH_SIZE, FLUSH_INTERVAL
+from services.tracing import span
+from services.utils import get_spreadsheet
+
+REQUESTS_PATH = "data/requests.db"
+REQUESTS_SHEET = HISTORY_SHEET
+# Columna de la hoja con el id local de la solicitud
+ID_COLUMN = chr(ord("A") + COLUMNS.index("request_id"))
+
+SHEET_HEADERS = [
+    "Time", "Commercial", "Cliente", "Customer Name", "Customer Phone", "Customer Email", "Container Type", "Service Type",
+    "Operation Type", "Reference", "Surcharges", "Total USD", "Total COP", "TRM", "Total en COP TRM", "Request ID",
+    "Operation Number",
+]
+
+# Registro local de las solicitudes enviadas. Cada solicitud se guarda primero en SQLite
+# (WAL) con un id creciente y desde ahí se genera el PDF, sin esperar a la red. Un hilo en
+# segundo plano la copia a la hoja con el id en su propia columna; antes de enviar revisa
+# qué ids ya están en la hoja, así que un envío que sí llegó pero no se confirmó (timeout,
+# caída del proceso) no se duplica al reintentar.
+
+class RequestStore(SyncWorker):
+    thread_name = "request-sync"
+    failure_message = "No se pudieron sincronizar las solicitudes con Google Sheets"
+
+    def __init__(self, path=REQUESTS_PATH, open_spreadsheet=get_spreadsheet, sheet_name=REQUESTS_SHEET,
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        super().__init__(flush_interval)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.open_spreadsheet = open_spreadsheet
+        self.sheet_name = sheet_name
+        self.batch_size = batch_size
+
+        self._worksheet = None
+
+        with connect(self.path) as connection:
+            # AUTOINCREMENT: los ids nunca se reutilizan, aunque se borren filas
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS requests ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " request TEXT NOT NULL,"
+                " sheet_row TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " synced_at REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS requests_pending ON requests (id) WHERE synced_at IS NULL")
+            # Última fila de la hoja cuyo id ya se revisó: la búsqueda de ids es incremental
+            connection.execute("CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def stop(self, sync=True):
+        self._join()
+        if sync:
+            self.reconcile()
+
+    def save(self, request, end_time_str):
+        # Solo SQLite: devuelve el id de la solicitud y el envío a la hoja queda pendiente
+        with connect(self.path) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            request_id = connection.execute(
+                "INSERT INTO requests (request, sheet_row, created_at) VALUES (?, '[]', ?)",
+                (request.to_json(), time.time()),
+            ).lastrowid
+            row = request.to_sheet_row(end_time_str, request_id)
+            connection.execute("UPDATE requests SET sheet_row = ? WHERE id = ?", (json.dumps(row, default=str), request_id))
+            connection.execute("COMMIT")
+        self._wake.set()
+        return request_id
+
+    def get(self, request_id):
+        with connect(self.path) as connection:
+            found = connection.execute("SELECT request FROM requests WHERE id = ?", (int(request_id),)).fetchone()
+        return SolicitudRequest.from_json(found[0]) if found else None
+
+    def pending(self):
+        with connect(self.path) as connection:
+            return connection.execute("SELECT COUNT(*) FROM requests WHERE synced_at IS NULL").fetchone()[0]
+
+    def _open_worksheet(self):
+        if self._worksheet is None:
+            sheet = self.open_spreadsheet()
+            try:
+                self._worksheet = sheet.worksheet(self.sheet_name)
+            except gspread.exceptions.WorksheetNotFound:
+                self._worksheet = sheet.add_worksheet(title=self.sheet_name, rows="1000", cols="30")
+                self._worksheet.append_row(SHEET_HEADERS)
+        return self._worksheet
+
+    def _ids_in_sheet(self, connection, worksheet):
+        # Ids escritos en la hoja desde la última revisión (la fila 1 es el encabezado)
+        checked = connection.execute("SELECT value FROM sync_state WHERE key = 'checked_row'").fetchone()
+        checked = checked[0] if checked else 1
+        values = worksheet.get(f"{ID_COLUMN}{checked + 1}:{ID_COLUMN}", value_render_option="UNFORMATTED_VALUE")
+
+        ids = set()
+        for cells in values:
+            try:
+                ids.add(int(float(cells[0])))
+            except (IndexError, TypeError, ValueError):
+                pass
+        connection.execute(
+            "INSERT OR REPLACE INTO sync_state (key, value) VALUES ('checked_row', ?)", (checked + len(values),)
+        )
+        return ids
+
+    def reconcile(self):
+        sent = 0
+        with connect(self.path) as connection:
+            while True:
+                batch = connection.execute(
+                    "SELECT id, sheet_row FROM requests WHERE synced_at IS NULL ORDER BY id LIMIT ?", (self.batch_size,)
+                ).fetchall()
+                if not batch:
+                    return sent
+
+                try:
+                    with span("sheet.open_worksheet"):
+                        worksheet = self._open_worksheet()
+                    with span("sheet.check_ids"):
+                        present = self._ids_in_sheet(connection, worksheet)
+
+                    missing = [item for item in batch if item[0] not in present]
+                    if missing:
+                        with span("sheet.append_rows"):
+                            worksheet.append_rows([json.loads(item[1]) for item in missing])
+                except gspread.exceptions.WorksheetNotFound:
+                    self._worksheet = None
+                    raise
+
+                connection.execute(
+                    f"UPDATE requests SET synced_at = ? WHERE id IN ({','.join('?' * len(batch))})",
+                    [time.time()] + [item[0] for item in batch],
+                )
+                sent += len(missing)
+
+    def sync_once(self):
+        self.reconcile()
+
+    def reset(self):
+        self._worksheet = None
+
+@st.cache_resource(show_spinner=False)
+def get_request_store():
+    return RequestStore().start()
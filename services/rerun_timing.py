@@ -0,0 +1,31 @@
+import time
+from collections import deque
+
+import streamlit as st
+
+from services.tracing import HISTOGRAMS
+
+MAX_TIMINGS = 30
+
+# Tiempos de cada corrida del script ("app") y de cada fragmento, por sesión. Sirve para
+# comprobar que editar un recargo solo vuelve a correr su fragmento y no toda la app.
+
+def record_run(scope, start):
+    elapsed = time.perf_counter() - start
+    HISTOGRAMS.observe(f"rerun.{scope}", elapsed)
+    timings = st.session_state.setdefault("rerun_timings", deque(maxlen=MAX_TIMINGS))
+    timings.append({"scope": scope, "ms": round(elapsed * 1000, 1), "at": time.strftime("%H:%M:%S")})
+
+def last_timing(scope):
+    for timing in reversed(st.session_state.get("rerun_timings", ())):
+        if timing["scope"] == scope:
+            return timing
+    return None
+
+def render_timings():
+    timings = list(st.session_state.get("rerun_timings", ()))
+    with st.expander("⏱ Rerun timings"):
+        if not timings:
+            st.caption("No runs recorded yet.")
+            return
+        st.dataframe(list(reversed(timings)), hide_index=True, use_container_width=True)
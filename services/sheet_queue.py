@@ -0,0 +1,127 @@
+import json
+import os
+import time
+
+import gspread
+import streamlit as st
+
+from services.local_sync import SyncWorker, connect
+from services.tracing import span
+from services.utils import get_spreadsheet
+
+QUEUE_PATH = "data/sheet_queue.db"
+BATCH_SIZE = 50
+FLUSH_INTERVAL = 2.0
+
+# Cola local durable de filas pendientes para Google Sheets. La UI solo inserta en SQLite y
+# sigue; un hilo en segundo plano agrupa las filas por pestaña y las envía con append_rows,
+# cada FLUSH_INTERVAL segundos o en cuanto se juntan BATCH_SIZE filas. Si Sheets falla, las
+# filas se quedan en la cola y se reintenta con backoff exponencial.
+
+class SheetWriter(SyncWorker):
+    thread_name = "sheet-writer"
+    failure_message = "No se pudieron enviar las filas pendientes a Google Sheets"
+
+    def __init__(self, path=QUEUE_PATH, open_spreadsheet=get_spreadsheet, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        super().__init__(flush_interval)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.open_spreadsheet = open_spreadsheet
+        self.batch_size = batch_size
+
+        self._worksheets = {}
+
+        with connect(self.path) as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS pending_rows ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " worksheet TEXT NOT NULL,"
+                " row TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS worksheet_headers (worksheet TEXT PRIMARY KEY, headers TEXT NOT NULL)"
+            )
+
+    def stop(self, flush=True):
+        self._join()
+        if flush:
+            self.flush()
+
+    def enqueue(self, worksheet, row, headers=None):
+        with connect(self.path) as connection:
+            if headers:
+                connection.execute(
+                    "INSERT OR REPLACE INTO worksheet_headers (worksheet, headers) VALUES (?, ?)",
+                    (worksheet, json.dumps(headers)),
+                )
+            cursor = connection.execute(
+                "INSERT INTO pending_rows (worksheet, row, created_at) VALUES (?, ?, ?)",
+                (worksheet, json.dumps(row, default=str), time.time()),
+            )
+            if self.pending(connection) >= self.batch_size:
+                self._wake.set()
+            return cursor.lastrowid
+
+    def pending(self, connection=None):
+        if connection is None:
+            with connect(self.path) as connection:
+                return self.pending(connection)
+        return connection.execute("SELECT COUNT(*) FROM pending_rows").fetchone()[0]
+
+    def _worksheet(self, connection, name):
+        if name not in self._worksheets:
+            sheet = self.open_spreadsheet()
+            try:
+                worksheet = sheet.worksheet(name)
+            except gspread.exceptions.WorksheetNotFound:
+                worksheet = sheet.add_worksheet(title=name, rows="1000", cols="30")
+                headers = connection.execute(
+                    "SELECT headers FROM worksheet_headers WHERE worksheet = ?", (name,)
+                ).fetchone()
+                if headers:
+                    worksheet.append_row(json.loads(headers[0]))
+            self._worksheets[name] = worksheet
+        return self._worksheets[name]
+
+    def flush(self):
+        sent = 0
+        with connect(self.path) as connection:
+            while True:
+                batch = connection.execute(
+                    "SELECT id, worksheet, row FROM pending_rows ORDER BY id LIMIT ?", (self.batch_size,)
+                ).fetchall()
+                if not batch:
+                    return sent
+
+                # Solo se envía la pestaña de la fila más antigua para conservar el orden de llegada
+                name = batch[0][1]
+                batch = [item for item in batch if item[1] == name]
+
+                try:
+                    with span("sheet.open_worksheet"):
+                        worksheet = self._worksheet(connection, name)
+                    with span("sheet.append_rows"):
+                        worksheet.append_rows([json.loads(item[2]) for item in batch])
+                except gspread.exceptions.WorksheetNotFound:
+                    self._worksheets.pop(name, None)
+                    raise
+
+                connection.execute(
+                    f"DELETE FROM pending_rows WHERE id IN ({','.join('?' * len(batch))})",
+                    [item[0] for item in batch],
+                )
+                sent += len(batch)
+
+    def sync_once(self):
+        self.flush()
+
+    def reset(self):
+        self._worksheets.clear()
+
+@st.cache_resource(show_spinner=False)
+def get_sheet_writer():
+    return SheetWriter().start()
+
+def enqueue_row(worksheet, row, headers=None):
+    return get_sheet_writer().enqueue(worksheet, row, headers)
@@ -0,0 +1,86 @@
+from functools import cached_property
+
+import re
+
+import pandas as pd
+
+COLUMNS = ["container", "concept", "currency", "cost"]
+
+# Una línea de sheet_lines: "{contenedor} - {concepto}: ${costo} {moneda}". El contenedor
+# termina en el primer " - " y el concepto en el último ": $"
+SHEET_LINE = re.compile(r"^(?P<container>.*?) - (?P<concept>.*): \$(?P<cost>[-+\d.,eE]+|nan) ?(?P<currency>\S*)\s*$")
+
+# Libro de recargos de una solicitud: una fila por recargo, en el orden del formulario
+# (contenedor y luego recargo). Los totales por contenedor salen de un solo groupby y de ahí
+# se derivan los totales por moneda y el total convertido con la TRM. La UI, la fila de
+# Sheets y el PDF usan el mismo objeto, así que nada se vuelve a calcular en la misma corrida.
+
+class SurchargeLedger:
+    def __init__(self, frame):
+        self.frame = frame
+
+    @classmethod
+    def from_records(cls, records):
+        # records: tuplas (contenedor, concepto, moneda, costo)
+        frame = pd.DataFrame.from_records(records, columns=COLUMNS)
+        frame["cost"] = frame["cost"].astype(float)
+        return cls(frame)
+
+    @classmethod
+    def from_surcharges(cls, additional_surcharges):
+        return cls.from_records(
+            (container, surcharge.get("concept", ""), surcharge.get("currency", "USD"), surcharge.get("cost", 0))
+            for container, surcharges in (additional_surcharges or {}).items()
+            for surcharge in surcharges
+        )
+
+    def __len__(self):
+        return len(self.frame)
+
+    @cached_property
+    def by_container(self):
+        # Serie indexada por (contenedor, moneda)
+        return self.frame.groupby(["container", "currency"], sort=False)["cost"].sum()
+
+    @cached_property
+    def by_currency(self):
+        totals = self.by_container.groupby(level="currency", sort=False).sum()
+        return {currency: float(total) for currency, total in totals.items()}
+
+    def total(self, currency):
+        return self.by_currency.get(currency, 0.0)
+
+    def converted_total(self, trm=None):
+        # USD convertido con la TRM (si la hay) más todo lo demás, como el total de la UI
+        usd = self.total("USD")
+        other = sum(total for currency, total in self.by_currency.items() if currency != "USD")
+        return usd * (trm if trm is not None else 1) + other
+
+    @cached_property
+    def formatted_costs(self):
+        return "$" + self.frame["cost"].map("{:.2f}".format).astype(str)
+
+    def table_rows(self):
+        # Concepto, moneda, contenedor y costo con formato, para la tabla del PDF
+        columns = [self.frame["concept"], self.frame["currency"], self.frame["container"], self.formatted_costs]
+        return [list(row) for row in zip(*columns)]
+
+    def sheet_lines(self):
+        frame = self.frame
+        lines = frame["container"] + " - " + frame["concept"] + ": " + self.formatted_costs + " " + frame["currency"]
+        return "\n".join(lines)
+
+def parse_sheet_lines(text):
+    # Inverso de sheet_lines: tuplas (contenedor, concepto, moneda, costo). Las líneas que no
+    # tienen el formato esperado (editadas a mano en la hoja) se omiten con un aviso.
+    records = []
+    for line in str(text or "").splitlines():
+        if not line.strip():
+            continue
+        match = SHEET_LINE.match(line.strip())
+        if match is None:
+            print(f"⚠️ Línea de recargo no reconocida: {line!r}")
+            continue
+        cost = float(match["cost"].replace(",", ""))
+        records.append((match["container"], match["concept"], match["currency"], cost))
+    return records
@@ -0,0 +1,93 @@
+from functools import lru_cache
+
+# Tabla de recargos de la solicitud. Las filas se reparten en bloques de altura fija: el
+# primero va en el espacio de la tabla del template (entre el encabezado impreso y el TOTAL)
+# y el resto en páginas de continuación con el encabezado de columnas repetido. Cada fila
+# ocupa una sola línea, así que la altura se mide una vez y el reparto es lineal.
+
+TABLE_X = 100
+COL_WIDTHS = [80, 200, 5, 160]
+
+FIRST_PAGE_TOP = 460
+FIRST_PAGE_BOTTOM = 255
+
+CONTINUATION_HEADER_Y = 690
+CONTINUATION_TOP = 680
+CONTINUATION_BOTTOM = 60
+
+# Encabezado de columnas en las mismas posiciones que el impreso en el template
+HEADER_COLUMNS = (("CONCEPT", 118), ("CURRENCY", 258), ("CONTAINER", 348), ("VALOR", 451))
+HEADER_LINE_X = (103, 509)
+
+BASE_STYLE = [
+    ('FONTNAME', (0,0), (-1,-1), 'OpenSauce'),
+    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+    ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+    ('FONTSIZE', (0,0), (-1,-1), 9),
+    ('TOPPADDING', (0,0), (-1,-1), 3),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 5),
+]
+
+def _table(rows, style):
+    # reportlab.platypus tarda ~100 ms en importarse: se carga en el primer PDF, no al arrancar
+    from reportlab.platypus import Table, TableStyle
+
+    table = Table(rows, colWidths=COL_WIDTHS)
+    table.setStyle(TableStyle(style))
+    return table
+
+@lru_cache(maxsize=1)
+def row_height():
+    return _table([["X", "USD", "X", "$0.00"]], BASE_STYLE).wrap(0, 0)[1]
+
+def paginate(rows, first_capacity, capacity):
+    chunks = [rows[:first_capacity]]
+    for start in range(first_capacity, len(rows), capacity):
+        chunks.append(rows[start:start + capacity])
+    return chunks
+
+def layout(ledger):
+    # Los subtotales van al final como filas en negrita y se reparten igual que el resto
+    subtotal_rows = [["Subtotal", currency, "", f"${total:.2f}"] for currency, total in ledger.by_currency.items()]
+    entries = [(row, False) for row in ledger.table_rows()] + [(row, True) for row in subtotal_rows]
+
+    height = row_height()
+    first_capacity = int((FIRST_PAGE_TOP - FIRST_PAGE_BOTTOM) // height)
+    capacity = int((CONTINUATION_TOP - CONTINUATION_BOTTOM) // height)
+    return paginate(entries, first_capacity, capacity)
+
+def draw_chunk(c, entries, y):
+    if not entries:
+        return
+
+    style = list(BASE_STYLE)
+    for i, (_, subtotal) in enumerate(entries):
+        if subtotal:
+            style.append(('FONTNAME', (0,i), (-1,i), 'OpenSauceBold'))
+
+    table = _table([row for row, _ in entries], style)
+    table_width, table_height = table.wrapOn(c, 0, 0)
+    table.drawOn(c, TABLE_X, y - table_height)
+
+def draw_header(c, y):
+    c.setFont("OpenSauceBold", 8)
+    for label, x in HEADER_COLUMNS:
+        c.drawString(x, y, label)
+
+    c.setLineWidth(0.8)
+    c.line(HEADER_LINE_X[0], y + 10, HEADER_LINE_X[1], y + 10)
+    c.line(HEADER_LINE_X[0], y - 6, HEADER_LINE_X[1], y - 6)
+
+def draw_continuation(c, data, entries, page, pages):
+    c.setFont("OpenSauceBold", 16)
+    c.drawString(115, 740, "Solicitud Anticipo")
+
+    c.setFont("OpenSauceBold", 7)
+    c.drawString(460, 745, f"Solicitud #: {data.get('no_solicitud', '').upper()}")
+    c.drawString(460, 736, f"Página {page} de {pages}")
+
+    c.setFont("OpenSauceBold", 9)
+    c.drawString(115, 715, f"{data.get('client', '').upper()} (continuación)")
+
+    draw_header(c, CONTINUATION_HEADER_Y)
+    draw_chunk(c, entries, CONTINUATION_TOP)
@@ -0,0 +1,51 @@
+from functools import lru_cache
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from services.fonts import ensure_fonts, font_metrics
+
+# Medición y partición de texto para los campos largos del PDF (cliente, concepto, referencia).
+# El ancho de cada palabra se cachea en unidades de la fuente (1/1000 del tamaño), así que la
+# misma palabra sirve para cualquier tamaño. Las fuentes usadas tienen anchos enteros, por lo
+# que sumar palabras da exactamente lo mismo que stringWidth sobre la línea completa. Para las
+# OpenSauce los anchos Latin-1 salen de la tabla precalculada, sin cargar el .ttf.
+
+@lru_cache(maxsize=8192)
+def word_units(word, font_name):
+    widths = font_metrics(font_name)
+    if widths and all(char in widths for char in word):
+        return sum(widths[char] for char in word)
+    ensure_fonts()
+    return stringWidth(word, font_name, 1000)
+
+def wrap_lines(text, font_name, font_size, max_width):
+    # Mismo corte que el wrapped_draw_string original: se agrega palabra por palabra mientras
+    # la línea quepa. Si la primera palabra ya no cabe, la primera línea queda vacía.
+    space = word_units(" ", font_name)
+    lines = []
+    line = []
+    line_units = 0
+
+    for word in text.split():
+        units = word_units(word, font_name)
+        test_units = line_units + space + units if line else units
+
+        if 0.001 * font_size * test_units <= max_width:
+            line.append(word)
+            line_units = test_units
+        else:
+            lines.append(" ".join(line))
+            line = [word]
+            line_units = units
+
+    if line:
+        lines.append(" ".join(line))
+
+    return lines
+
+def draw_wrapped(c, text, x, y, font_name, font_size, max_width, leading=12):
+    # Dibuja el texto partido en líneas y devuelve el desplazamiento de la última línea
+    lines = wrap_lines(text, font_name, font_size, max_width)
+    for i, line in enumerate(lines):
+        c.drawString(x, y - i * leading, line)
+    return max(len(lines) - 1, 0) * leading
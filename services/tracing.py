@@ -0,0 +1,217 @@
+import contextvars
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+METRICS_PATH = "data/metrics.prom"
+EXPORT_INTERVAL = 15.0
+MAX_TRACES = 20
+# Límites de los buckets del histograma, en segundos
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Spans con tiempo por etapa del envío de una solicitud. Cada span se suma a un histograma
+# por etapa (formato de texto de Prometheus, a un archivo y opcionalmente a un puerto local)
+# y queda en la traza de su sesión con un id de correlación. Los spans anidados dentro de
+# uno raíz forman una traza; los hilos de fondo (cola de Sheets, Drive) usan el id de la
+# sesión que encoló el trabajo, o el nombre del hilo si no hay ninguna.
+
+_correlation = contextvars.ContextVar("correlation_id", default=None)
+_trace = contextvars.ContextVar("trace", default=None)
+
+class Histograms:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, stage, seconds, status="ok"):
+        with self._lock:
+            series = self._series.get((stage, status))
+            if series is None:
+                series = self._series[(stage, status)] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += seconds
+            series["count"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {key: {"counts": list(value["counts"]), "sum": value["sum"], "count": value["count"]} for key, value in self._series.items()}
+
+    def render(self):
+        # Formato de exposición de texto de Prometheus; los buckets son acumulados
+        lines = [
+            "# HELP solicitud_stage_seconds Duration of each stage of the solicitud pipeline.",
+            "# TYPE solicitud_stage_seconds histogram",
+        ]
+        for (stage, status), series in sorted(self.snapshot().items()):
+            labels = f'stage="{stage}",status="{status}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                lines.append(f'solicitud_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'solicitud_stage_seconds_bucket{{{labels},le="+Inf"}} {series["count"]}')
+            lines.append(f"solicitud_stage_seconds_sum{{{labels}}} {series['sum']:.6f}")
+            lines.append(f"solicitud_stage_seconds_count{{{labels}}} {series['count']}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        # Filas para el panel: conteo, media y p95 aproximado (límite del bucket)
+        rows = []
+        for (stage, status), series in sorted(self.snapshot().items()):
+            p95 = None
+            target = series["count"] * 0.95
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                if cumulative >= target:
+                    p95 = bound
+                    break
+            rows.append({
+                "stage": stage, "status": status, "count": series["count"],
+                "mean_ms": round(series["sum"] / series["count"] * 1000, 1),
+                "p95_ms_le": p95 * 1000 if p95 is not None else None,
+            })
+        return rows
+
+HISTOGRAMS = Histograms()
+
+def correlation_id():
+    cid = _correlation.get()
+    if cid:
+        return cid
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        return st.session_state.setdefault("correlation_id", uuid.uuid4().hex[:12])
+    return threading.current_thread().name
+
+@contextmanager
+def correlated(cid):
+    # Para trabajo en otro hilo: sus spans llevan el id de la sesión que lo pidió
+    token = _correlation.set(cid)
+    try:
+        yield
+    finally:
+        _correlation.reset(token)
+
+def _finish(trace):
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        st.session_state.setdefault("traces", deque(maxlen=MAX_TRACES)).append(trace)
+
+@contextmanager
+def span(stage):
+    start = time.perf_counter()
+    trace = _trace.get()
+    root = trace is None
+    if root:
+        trace = {"id": uuid.uuid4().hex[:8], "correlation_id": correlation_id(), "stage": stage,
+                 "at": time.strftime("%H:%M:%S"), "start": start, "spans": []}
+        token = _trace.set(trace)
+
+    status = "ok"
+    try:
+        yield trace
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        HISTOGRAMS.observe(stage, elapsed, status)
+        trace["spans"].append({
+            "stage": stage, "status": status,
+            "offset_ms": round((start - trace["start"]) * 1000, 1),
+            "ms": round(elapsed * 1000, 1),
+        })
+        if root:
+            _trace.reset(token)
+            trace["ms"] = round(elapsed * 1000, 1)
+            _finish(trace)
+
+def export_metrics(path=METRICS_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        f.write(HISTOGRAMS.render())
+    os.replace(temporary, path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = HISTOGRAMS.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class MetricsExporter:
+    def __init__(self, path=METRICS_PATH, port=None, interval=EXPORT_INTERVAL):
+        self.path = path
+        self.port = port
+        self.interval = interval
+        self.server = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.port and self.server is None:
+            try:
+                # Solo en localhost: el scraper de Prometheus corre en la misma máquina
+                self.server = ThreadingHTTPServer(("127.0.0.1", int(self.port)), _MetricsHandler)
+            except OSError as e:
+                print(f"⚠️ No se pudo abrir el puerto de métricas {self.port} ({e}).")
+            else:
+                threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+
+        if self.path and (self._thread is None or not self._thread.is_alive()):
+            self._thread = threading.Thread(target=self._run, name="metrics-export", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                export_metrics(self.path)
+            except OSError as e:
+                print(f"⚠️ No se pudieron escribir las métricas en {self.path} ({e}).")
+
+@st.cache_resource(show_spinner=False)
+def get_metrics_exporter():
+    # general.metrics_path (archivo, "" para desactivarlo) y general.metrics_port (opcional)
+    general = st.secrets.get("general", {})
+    return MetricsExporter(general.get("metrics_path", METRICS_PATH), general.get("metrics_port")).start()
+
+def render_traces():
+    traces = list(st.session_state.get("traces", ()))
+    with st.expander("🔎 Traces"):
+        st.caption(f"Correlation ID: {correlation_id()}")
+        if traces:
+            for trace in reversed(traces):
+                st.write(f"**{trace['stage']}** · {trace['at']} · {trace['ms']} ms · trace {trace['id']}")
+                st.dataframe(sorted(trace["spans"], key=lambda item: (item["offset_ms"], -item["ms"])), hide_index=True, use_container_width=True)
+        else:
+            st.caption("No traces recorded yet.")
+
+        summary = HISTOGRAMS.summary()
+        if summary:
+            st.write("**Stages (all sessions)**")
+            st.dataframe(summary, hide_index=True, use_container_width=True)
@@ -0,0 +1,178 @@
+import csv
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+from datetime import date, datetime
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from services.tracing import span
+
+RATES_PATH = "data/trm.csv"
+# TRM histórica publicada por la Superintendencia Financiera en datos.gov.co (Socrata)
+DATOS_GOV_URL = "https://www.datos.gov.co/resource/32sa-8pi3.json"
+REFRESH_INTERVAL = 6 * 60 * 60
+FETCH_TIMEOUT = 10
+# Una TRM rige desde su fecha hasta la siguiente publicada (fines de semana y festivos
+# incluidos); más de estos días sin una nueva quiere decir que la tabla está desactualizada
+MAX_AGE_DAYS = 4
+
+# Tabla de TRM por fecha de vigencia. Se carga del CSV local (fecha,trm) y un hilo en
+# segundo plano le agrega las fechas nuevas desde una fuente intercambiable (por defecto
+# datos.gov.co), guardándolas también en el CSV. La consulta por fecha es una búsqueda
+# binaria sobre las fechas ordenadas; el re-precio de muchas solicitudes usa merge_asof.
+
+def _day(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip()[:10], "%Y-%m-%d").date()
+
+def datos_gov_source(since=None, url=DATOS_GOV_URL, timeout=FETCH_TIMEOUT):
+    # Filas (fecha de vigencia, valor) con vigencia desde `since` (incluido), en orden
+    params = {"$select": "valor,vigenciadesde", "$order": "vigenciadesde", "$limit": 50000}
+    if since is not None:
+        params["$where"] = f"vigenciadesde >= '{since.isoformat()}T00:00:00'"
+    with urlopen(f"{url}?{urlencode(params)}", timeout=timeout) as response:
+        rows = json.load(response)
+    return [(_day(row["vigenciadesde"]), float(row["valor"])) for row in rows]
+
+class TRMRates:
+    def __init__(self, path=RATES_PATH, source=datos_gov_source, refresh_interval=REFRESH_INTERVAL):
+        self.path = path
+        self.source = source
+        self.refresh_interval = refresh_interval
+        self.last_refresh = None
+        self.last_error = None
+
+        # Listas paralelas ordenadas por fecha; se reemplazan enteras al agregar, así quien
+        # esté consultando la versión anterior no la ve cambiar
+        self._days = []
+        self._values = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        if os.path.exists(path):
+            with open(path, newline="", encoding="utf-8") as f:
+                rows = []
+                for row in csv.reader(f):
+                    try:
+                        rows.append((_day(row[0]), float(row[1])))
+                    except (IndexError, ValueError):
+                        pass  # encabezado o línea editada a mano
+            self._merge(rows)
+
+    def __len__(self):
+        return len(self._days)
+
+    def _merge(self, rows):
+        # Devuelve las filas que no estaban; una fecha repetida conserva el valor más reciente
+        rates = dict(zip(self._days, self._values))
+        added = [(day, value) for day, value in rows if rates.get(day.toordinal()) != value]
+        rates.update((day.toordinal(), value) for day, value in rows)
+        days = sorted(rates)
+        self._days, self._values = days, [rates[day] for day in days]
+        return added
+
+    def add(self, rows):
+        rows = [(_day(day), float(value)) for day, value in rows]
+        with self._lock:
+            added = self._merge(rows)
+            if added and self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                new_file = not os.path.exists(self.path)
+                with open(self.path, "a", newline="", encoding="utf-8") as f:
+                    writer = csv.writer(f)
+                    if new_file:
+                        writer.writerow(["date", "trm"])
+                    writer.writerows((day.isoformat(), value) for day, value in added)
+        return len(added)
+
+    def latest(self):
+        days = self._days
+        return (date.fromordinal(days[-1]), self._values[-1]) if days else None
+
+    def rate_for(self, day, max_age=MAX_AGE_DAYS):
+        # (fecha de vigencia, TRM) que regía ese día, o None si no hay una lo bastante reciente
+        days, values = self._days, self._values
+        ordinal = _day(day).toordinal()
+        position = bisect_right(days, ordinal) - 1
+        if position < 0 or ordinal - days[position] > max_age:
+            return None
+        return date.fromordinal(days[position]), values[position]
+
+    def frame(self):
+        return pd.DataFrame({
+            "date": pd.to_datetime([date.fromordinal(day) for day in self._days]).astype("datetime64[ns]"),
+            "trm": np.asarray(self._values, dtype="float64"),
+        })
+
+    def refresh(self):
+        if self.source is None:
+            return 0
+        with span("trm.refresh"):
+            latest = self.latest()
+            added = self.add(self.source(latest[0] if latest else None))
+        self.last_refresh = time.time()
+        return added
+
+    def start(self):
+        if self.source is not None and (self._thread is None or not self._thread.is_alive()):
+            self._thread = threading.Thread(target=self._run, name="trm-refresh", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"⚠️ No se pudo actualizar la tabla de TRM ({self.last_error}).")
+            self._stop.wait(self.refresh_interval)
+
+def fill_trm(request, rates):
+    # Solicitud con USD y COP guardada sin TRM (filas viejas): se le pone la que regía en su
+    # fecha de emisión antes de dibujar el PDF, así la TRM también entra en la llave de la caché
+    if request.trm is None and rates is not None and {"USD", "COP"} <= set(request.surcharge_ledger.by_currency):
+        day = datetime.strptime(request.issue_date, "%d/%m/%Y") if request.issue_date else date.today()
+        official = rates.rate_for(day)
+        if official:
+            request.trm = official[1]
+    return request
+
+def reprice(frame, rates, max_age=MAX_AGE_DAYS):
+    # Re-precio de muchas solicitudes de una vez: la TRM que regía el día de cada una
+    # (merge_asof hacia atrás) y el total en COP con esa TRM. frame trae time, total_usd y
+    # total_cop, como HistoryIndex.frame; las filas sin TRM en la tabla quedan en NaN.
+    days = pd.to_datetime(frame["time"], errors="coerce").dt.normalize().astype("datetime64[ns]")
+    valid = days.notna().to_numpy()
+    left = pd.DataFrame({"position": np.flatnonzero(valid), "day": days[valid].to_numpy()}).sort_values("day", kind="stable")
+    merged = pd.merge_asof(
+        left, rates.frame(), left_on="day", right_on="date", direction="backward", tolerance=pd.Timedelta(days=max_age)
+    )
+
+    trm = np.full(len(frame), np.nan)
+    trm[merged["position"].to_numpy()] = merged["trm"].to_numpy()
+    usd = pd.to_numeric(frame["total_usd"], errors="coerce").fillna(0).to_numpy()
+    cop = pd.to_numeric(frame["total_cop"], errors="coerce").fillna(0).to_numpy()
+    return frame.assign(trm_table=trm, total_cop_table=np.where(usd != 0, usd * trm + cop, cop))
+
+@st.cache_resource(show_spinner=False)
+def get_trm_rates():
+    # general.trm_source_url ("" para usar solo el CSV local)
+    url = st.secrets.get("general", {}).get("trm_source_url", DATOS_GOV_URL)
+    source = (lambda since: datos_gov_source(since, url)) if url else None
+    return TRMRates(source=source).start()
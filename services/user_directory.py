@@ -0,0 +1,71 @@
+import json
+import os
+from functools import lru_cache
+
+USERS_PATH = "resources/config/users.json"
+
+# Si un correo aparece en varios roles gana el primero de esta lista
+ROLE_PRIORITY = ("admin", "inside", "commercial")
+
+# Directorio de usuarios: roles por correo y perfiles de los comerciales (firma del PDF).
+# Se carga de resources/config/users.json y se vuelve a leer solo cuando cambia el archivo.
+
+def normalize_email(email):
+    return (email or "").strip().casefold()
+
+class UserDirectory:
+    def __init__(self, roles, reps):
+        self._roles = {}
+        for role in sorted(roles, key=lambda name: ROLE_PRIORITY.index(name) if name in ROLE_PRIORITY else len(ROLE_PRIORITY)):
+            for email in roles[role]:
+                self._roles.setdefault(normalize_email(email), role)
+
+        self._reps = {rep["name"]: rep for rep in reps}
+        self._reps_by_email = {}
+        for rep in reps:
+            self._reps_by_email.setdefault(normalize_email(rep.get("email")), rep["name"])
+        self._reps_by_email.pop("", None)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(config.get("roles", {}), config.get("reps", []))
+
+    def role(self, email):
+        return self._roles.get(normalize_email(email))
+
+    def rep_name(self, email):
+        # Comercial con ese correo en su perfil, o None
+        return self._reps_by_email.get(normalize_email(email))
+
+    def rep(self, name):
+        return self._reps.get(name) or {"name": name, "position": "N/A", "tel": "N/A", "email": "N/A"}
+
+@lru_cache(maxsize=4)
+def _load_directory(path, mtime):
+    return UserDirectory.from_file(path)
+
+_last_directory = {}
+
+def get_directory(path=USERS_PATH):
+    try:
+        directory = _load_directory(path, os.stat(path).st_mtime_ns)
+    except (OSError, ValueError) as e:
+        # Archivo a medio editar o con errores: se sigue con la última versión válida
+        if path not in _last_directory:
+            raise
+        print(f"⚠️ No se pudo recargar el directorio de usuarios ({e}); se usa la versión anterior.")
+        return _last_directory[path]
+
+    _last_directory[path] = directory
+    return directory
+
+def identity_role(email):
+    return get_directory().role(email)
+
+def rep_name(email):
+    return get_directory().rep_name(email)
+
+def user_data(commercial):
+    return get_directory().rep(commercial)
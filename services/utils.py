@@ -1,112 +1,99 @@
+import threading
 import streamlit as st
-import pandas as pd
+from google.auth.transport.requests import Request
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
 import gspread
-from datetime import datetime
 
-time_sheet_id = st.secrets["general"]["time_sheet_id"]
+SHEETS_SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+DRIVE_SCOPES = ["https://www.googleapis.com/auth/drive"]
 
-sheets_creds = Credentials.from_service_account_info(
-        st.secrets["google_sheets_credentials"],
-        scopes=[
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive",
-        ]
-    )
+# Los clientes de Google se crean la primera vez que se usan y se comparten en todo el
+# proceso (st.cache_resource). Importar este módulo no lee secretos ni abre conexiones.
 
-sheets_service = build('sheets', 'v4', credentials=sheets_creds)
+def get_time_sheet_id():
+    return st.secrets["general"]["time_sheet_id"]
 
-drive_creds = Credentials.from_service_account_info(
-    st.secrets["google_drive_credentials"],
-    scopes=["https://www.googleapis.com/auth/drive"]
-)
+def _credentials_usable(creds):
+    # El token se reutiliza mientras sea válido; si expiró se refresca sobre el mismo objeto.
+    # Si el refresco falla, Streamlit descarta las credenciales y las vuelve a crear.
+    # Sin token todavía no hay nada que validar: se pide con la primera llamada a la API.
+    if creds.valid or creds.token is None:
+        return True
+    try:
+        creds.refresh(Request())
+        return True
+    except Exception:
+        return False
+
+@st.cache_resource(show_spinner=False, validate=_credentials_usable)
+def get_sheets_credentials():
+    return Credentials.from_service_account_info(st.secrets["google_sheets_credentials"], scopes=SHEETS_SCOPES)
+
+@st.cache_resource(show_spinner=False, validate=_credentials_usable)
+def get_drive_credentials():
+    return Credentials.from_service_account_info(st.secrets["google_drive_credentials"], scopes=DRIVE_SCOPES)
+
+@st.cache_resource(show_spinner=False, validate=lambda client: client.http_client.auth is get_sheets_credentials())
+def get_gspread_client():
+    # gspread usa una requests.Session autorizada: las conexiones HTTP se mantienen vivas
+    return gspread.authorize(get_sheets_credentials())
+
+@st.cache_resource(show_spinner=False, validate=lambda sheet: sheet.client is get_gspread_client().http_client)
+def get_spreadsheet():
+    return get_gspread_client().open_by_key(get_time_sheet_id())
+
+# Los clientes de discovery usan httplib2, que no es thread-safe: se mantiene uno por hilo
+# (cada uno con sus conexiones abiertas), todos con las mismas credenciales compartidas.
+_discovery_clients = threading.local()
 
-drive_service = build('drive', 'v3', credentials=drive_creds)
+def _discovery_client(name, version, credentials):
+    cached = getattr(_discovery_clients, name, None)
+    if cached is None or cached[0] is not credentials:
+        cached = (credentials, build(name, version, credentials=credentials, cache_discovery=False))
+        setattr(_discovery_clients, name, cached)
+    return cached[1]
 
-client_gcp = gspread.authorize(sheets_creds)
+def get_sheets_service():
+    return _discovery_client("sheets", "v4", get_sheets_credentials())
+
+def get_drive_service():
+    return _discovery_client("drive", "v3", get_drive_credentials())
+
+def check_google_clients():
+    # Verificación de salud: credenciales con token válido y acceso a la hoja principal.
+    # Un cliente que falla se descarta para que el siguiente uso lo vuelva a crear.
+    status = {}
+
+    for name, getter in (("sheets_credentials", get_sheets_credentials), ("drive_credentials", get_drive_credentials)):
+        try:
+            creds = getter()
+            if not creds.valid:
+                creds.refresh(Request())
+            status[name] = True
+        except Exception:
+            status[name] = False
+            getter.clear()
 
-@st.cache_data(ttl=3600)
-def load_clients():
-    sheet_name = "clientes"
-    
     try:
-        sheet = client_gcp.open_by_key(time_sheet_id)
-        worksheet_list = [ws.title for ws in sheet.worksheets()]
-        
-        if sheet_name not in worksheet_list:
-            return []
-
-        worksheet = sheet.worksheet(sheet_name)
-        clientes = worksheet.col_values(1)
-
-        return clientes[1:]
-
-    except gspread.exceptions.SpreadsheetNotFound:
-        st.error("No se encontró la hoja de cálculo con el ID proporcionado.")
-    except gspread.exceptions.WorksheetNotFound:
-        st.error(f"No se encontró la pestaña '{sheet_name}' en la hoja de cálculo.")
-    except Exception as e:
-        st.error(f"Error al cargar los clientes desde Google Sheets: {e}")
-    
-    return []
-
-def user_data(commercial):
-    users = {
-        "Sharon Zuñiga": {
-            "name": "Sharon Zuñiga",
-            "tel": "+57 (300) 510 0295",
-            "position": "Business Development Manager Latam & USA",
-            "email": "sales2@tradingsolutions.com"
-        },
-        "Irina Paternina": {
-            "name": "Irina Paternina",
-            "tel": "+57 (301) 3173340",
-            "position": "Business Executive",
-            "email": "sales1@tradingsolutions.com"
-        },
-        "Johnny Farah": {
-            "name": "Johnny Farah",
-            "tel": "+57 (301) 6671725",
-            "position": "Manager of Americas",
-            "email": "sales3@tradingsolutions.com"
-        },
-        "Jorge Sánchez": {
-            "name": "Jorge Sánchez",
-            "tel": "+57 (301) 7753510",
-            "position": "Reefer Department Manager",
-            "email": "sales4@tradingsolutions.com"
-        },
-        "Pedro Luis Bruges": {
-            "name": "Pedro Luis Bruges",
-            "tel": "+57 (304) 4969358",
-            "position": "Global Sales Manager",
-            "email": "sales@tradingsolutions.com"
-        },
-        "Ivan Zuluaga": {
-            "name": "Ivan Zuluaga",
-            "tel": "+57 (300) 5734657",
-            "position": "Business Development Manager Latam & USA",
-            "email": "sales5@tradingsolutions.com"
-        },
-        "Andrés Consuegra": { 
-            "name": "Andrés Consuegra",
-            "tel": "+57 (301) 7542622",
-            "position": "CEO",
-            "email": "manager@tradingsolutions.com"
-        },
-        "Stephanie Bruges": {
-            "name": "Stephanie Bruges",
-            "tel": "+57 300 4657077",
-            "position": "Business Development Specialist",
-            "email": "bds@tradingsolutions.com"
-        },
-        "Catherine Silva": {
-            "name": "Catherine Silva",
-            "tel": "+57 304 4969351",
-            "position": "Inside Sales",
-            "email": "insidesales@tradingsolutions.com"
-        }
-    }
-
-    return users.get(commercial, {"name": commercial, "position": "N/A", "tel": "N/A", "email": "N/A"})
+        get_spreadsheet().fetch_sheet_metadata(params={"fields": "spreadsheetId"})
+        status["spreadsheet"] = True
+    except Exception:
+        status["spreadsheet"] = False
+        get_spreadsheet.clear()
+        get_gspread_client.clear()
+
+    return status
+
+def render_google_status():
+    # Panel de administración: la verificación solo corre al pedirla (hace una llamada a la API)
+    with st.expander("🩺 Google connections"):
+        if st.button("Check connections", key="check_google_clients"):
+            status = check_google_clients()
+            for name, ok in status.items():
+                st.write(f"{'✅' if ok else '❌'} {name.replace('_', ' ').capitalize()}")
+            if not all(status.values()):
+                st.caption("Failed clients were discarded and will be recreated on next use.")
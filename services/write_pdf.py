@@ -1,61 +1,50 @@
-import json
+import hashlib
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 import PyPDF2
-from reportlab.platypus import Table, TableStyle
-import streamlit as st
-from reportlab.pdfbase.ttfonts import TTFont
 import os
-from reportlab.pdfbase import pdfmetrics
+import threading
+from functools import lru_cache
+from io import BytesIO
 from datetime import datetime
-from services.utils import user_data
-from reportlab.pdfbase.pdfmetrics import stringWidth
+from services.fonts import ensure_fonts
+from services.user_directory import user_data
+from services.text_layout import draw_wrapped
+from services.surcharge_ledger import SurchargeLedger
+from services.models import SolicitudRequest
+from services.tracing import span
+from services.surcharge_table import FIRST_PAGE_BOTTOM, FIRST_PAGE_TOP, draw_chunk, draw_continuation, layout as surcharge_layout
+from PyPDF2.generic import (
+    ArrayObject, DecodedStreamObject, DictionaryObject, EncodedStreamObject, IndirectObject, NameObject, NumberObject,
+    StreamObject,
+)
 
 def wrapped_draw_string(c, text, x, y, fontName, fontSize, max_width, leading=12):
-    words = text.split()
-    line = ""
-    y_offset = 0
-
-    for word in words:
-        test_line = f"{line} {word}".strip()
-        if stringWidth(test_line, fontName, fontSize) <= max_width:
-            line = test_line
-        else:
-            c.drawString(x, y - y_offset, line)
-            y_offset += leading
-            line = word
-
-    if line:
-        c.drawString(x, y - y_offset, line)
-
-    return y_offset
-
-font_path = "resources/fonts/OpenSauceSans-Regular.ttf"
-font_bold = "resources/fonts/OpenSauceSans-Bold.ttf"
-
-if os.path.exists(font_path):
-    pdfmetrics.registerFont(TTFont("OpenSauce", font_path))
-else:
-    print("⚠️ Advertencia: La fuente 'Open Sauce' no se encontró. Se usará 'Helvetica' como alternativa.")
+    return draw_wrapped(c, text, x, y, fontName, fontSize, max_width, leading)
 
-if os.path.exists(font_bold):
-    pdfmetrics.registerFont(TTFont("OpenSauceBold", font_bold))
-else:
-    print("⚠️ Advertencia: La fuente 'Open Sauce Bold' no se encontró. Se usará 'Helvetica' como alternativa.")
+TEMPLATE_PATH = "resources/archives/Solicitud Anticipo-2.pdf"
 
+_font_lock = threading.Lock()
 
-def create_overlay(data, overlay_path):
+def _save_canvas(c):
+    # El subsetting de las TTFont registradas no es thread-safe
+    with _font_lock:
+        c.save()
 
-    commercial_data = user_data(data.get('commercial'))
+FOOTER_Y = 190
 
-    c = canvas.Canvas(overlay_path, pagesize=letter)
-    current_date = datetime.today().strftime("%d/%m/%Y")
+FOOTER_NOTES = (
+    "* Precios no incluyen IVA y están sujetos al mismo.",
+    "* Los pagos en dólares se realizan a la TRM del día del pago a la línea +2%.",
+    "* (El día de la facturación se coloca la TRM a la que se realiza el pago).",
+)
 
-    c.setFont("OpenSauceBold", 7)
-
-    c.drawString(525, 669, f"{data.get('no_solicitud', '').upper()}")
-    c.drawString(510, 660, current_date)
+def draw_static(c):
+    c.setFont("OpenSauce", 8)
+    for i, note in enumerate(FOOTER_NOTES):
+        c.drawString(115, FOOTER_Y - i * 10, note)
 
+def draw_signature(c, commercial_data):
     c.setFont("OpenSauce", 9)
     name = f"{commercial_data.get('name', '').upper()}.  "
     position = commercial_data.get('position', '').upper()
@@ -78,6 +67,26 @@ def create_overlay(data, overlay_path):
     c.drawString(300, 120, f"{commercial_data.get('tel', '').upper()}")
     c.drawString(300, 110, f"{commercial_data.get('email', '').upper()}")
 
+def create_overlay(data, overlay_path=None, layered=False, ledger=None):
+    # Sin overlay_path el overlay se dibuja en memoria y se devuelven los bytes.
+    # Con layered=True solo se dibujan los campos de la solicitud; el pie legal y la
+    # firma del comercial ya vienen en el template cacheado (ver load_layered_template).
+    buffer = BytesIO() if overlay_path is None else overlay_path
+
+    ensure_fonts()
+    c = canvas.Canvas(buffer, pagesize=letter)
+
+    if not layered:
+        draw_static(c)
+        draw_signature(c, user_data(data.get('commercial')))
+
+    current_date = data.get("issue_date") or datetime.today().strftime("%d/%m/%Y")
+
+    c.setFont("OpenSauceBold", 7)
+
+    c.drawString(525, 669, f"{data.get('no_solicitud', '').upper()}")
+    c.drawString(510, 660, current_date)
+
     c.setFont("OpenSauceBold", 10) 
     MAX_WIDTH = 200
 
@@ -117,94 +126,346 @@ def create_overlay(data, overlay_path):
     if reference.strip():
         c.drawString(300, 546, f"Referencia de cliente: {reference}")
 
-    table_data = []
-    total_cost_by_currency = {}
+    # Tabla de recargos: lo que no cabe en la primera página sigue en páginas de continuación
+    if ledger is None:
+        ledger = SurchargeLedger.from_surcharges(data.get("additional_surcharges", {}))
+    chunks = surcharge_layout(ledger)
+    draw_chunk(c, chunks[0], FIRST_PAGE_TOP)
 
-    # Procesar los additional_surcharges por tipo de contenedor
-    for container, surcharges in data.get("additional_surcharges", {}).items():
-        for additional in surcharges:
-            cost = additional.get("cost", 0)
-            currency = additional.get("currency", "USD")
-
-            total_cost_by_currency[currency] = total_cost_by_currency.get(currency, 0) + cost
-
-            row = [
-                additional.get("concept", ""),  # Concepto
-                currency,                       # Moneda
-                container,                      # Contenedor
-                f"${cost:.2f}",                 # Costo con formato
-            ]
-            table_data.append(row)
-
-    col_widths = [80, 200, 5, 160]
-
-    table = Table(table_data, colWidths=col_widths)
-
-    style = TableStyle([
-        ('FONTNAME', (0,0), (-1,-1), 'OpenSauce'),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('FONTSIZE', (0,0), (-1,-1), 9),
-        ('TOPPADDING', (0,0), (-1,-1), 3),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 5),
-    ])
-    table.setStyle(style)
-
-    x = 100
-    y = 460
-    table_width, table_height = table.wrapOn(c, 0, 0)
-    table.drawOn(c, x, y - table_height)
+    if len(chunks) > 1:
+        c.setFont("OpenSauce", 8)
+        c.drawString(115, FIRST_PAGE_BOTTOM - 8, f"* Continúa en la página 2 de {len(chunks)}.")
 
     totales_str = f"{data.get('total_cop_trm')}"
 
     c.setFont("OpenSauceBold", 9)
     c.drawString(395, 240, totales_str)
 
-    c.setFont("OpenSauce", 8)
-    y_position = 190
-
-    y_position_offset = 0
-
-    trm = str(data.get('trm', '')).strip()
+    raw_trm = data.get('trm', None)
+    if raw_trm not in (None, "", "None"):
+        c.setFont("OpenSauce", 8)
+        c.drawString(115, FOOTER_Y - len(FOOTER_NOTES) * 10, f"* TRM: ${str(raw_trm).strip()}")
 
-    fields = [
-        ("", "* Precios no incluyen IVA y están sujetos al mismo."),
-        ("", "* Los pagos en dólares se realizan a la TRM del día del pago a la línea +2%."),
-        ("", "* (El día de la facturación se coloca la TRM a la que se realiza el pago)."),
-    ]
+    for page, entries in enumerate(chunks[1:], start=2):
+        c.showPage()
+        draw_continuation(c, data, entries, page, len(chunks))
 
+    _save_canvas(c)
 
-    raw_trm = data.get('trm', None)
-    if raw_trm not in (None, "", "None"):
-        fields.append(("", f"* TRM: ${str(raw_trm).strip()}"))
-
-    y_position_offset = 0
-    for label, value in fields:
-        c.drawString(
-            115,
-            y_position - y_position_offset,
-            f"{label + ': ' if label else ''}{value}"
-        )
-        y_position_offset += 10
+    if overlay_path is None:
+        return buffer.getvalue()
+    return overlay_path
 
-    c.save()
+# Los templates se cachean como (bytes, PdfReader) ya normalizados por PyPDF2 (tabla xref
+# clásica). Cada solicitud añade una actualización incremental al final de esos bytes con su
+# overlay como Form XObject, sin volver a serializar el template. Los PdfReader resuelven
+# objetos de forma perezosa sobre su stream, así que las lecturas del template van con lock.
+_template_lock = threading.Lock()
 
-def merge_pdfs(template_path, overlay_path, output_path):
-    template_pdf = PyPDF2.PdfReader(template_path)
-    overlay_pdf = PyPDF2.PdfReader(overlay_path)
+def _normalize(reader):
     output = PyPDF2.PdfWriter()
+    for page in reader.pages:
+        page = output.add_page(page)
+        # Datos privados de Illustrator (~500 KB) y miniatura: el visor no los usa
+        for key in ("/PieceInfo", "/Thumb"):
+            if key in page:
+                del page[key]
+
+    buffer = BytesIO()
+    output.write(buffer)
+    data = buffer.getvalue()
+
+    normalized = PyPDF2.PdfReader(BytesIO(data))
+    for page in normalized.pages:
+        page["/Resources"].get("/XObject", DictionaryObject()).get_object()
+    return data, normalized
+
+@lru_cache(maxsize=8)
+def _parse_template(template_path, mtime):
+    return _normalize(PyPDF2.PdfReader(template_path))
+
+def load_template(template_path):
+    # La clave incluye el mtime para que un template editado se vuelva a leer
+    return _parse_template(template_path, os.path.getmtime(template_path))
+
+def _render_layer(draw, *args):
+    ensure_fonts()
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    draw(c, *args)
+    _save_canvas(c)
+    return buffer.getvalue()
+
+@lru_cache(maxsize=1)
+def static_layer():
+    return _render_layer(draw_static)
+
+@lru_cache(maxsize=16)
+def _layered_template(template_path, mtime, name, position, tel, email):
+    # Template con el pie legal y la firma del comercial ya estampados. Se arma una vez por
+    # comercial; cada solicitud solo estampa sus campos variables encima.
+    signature = _render_layer(draw_signature, {"name": name, "position": position, "tel": tel, "email": email})
+    layers = [PyPDF2.PdfReader(BytesIO(layer)).pages[0] for layer in (static_layer(), signature)]
+    stamped = _stamp(_parse_template(template_path, mtime), [layers])
+    return _normalize(PyPDF2.PdfReader(BytesIO(stamped)))
+
+def load_layered_template(template_path, commercial_data):
+    return _layered_template(
+        template_path,
+        os.path.getmtime(template_path),
+        commercial_data.get('name', ''),
+        commercial_data.get('position', ''),
+        commercial_data.get('tel', ''),
+        commercial_data.get('email', ''),
+    )
 
-    for page_number in range(len(template_pdf.pages)):
-        template_page = template_pdf.pages[page_number]
-        if page_number < len(overlay_pdf.pages):
-            overlay_page = overlay_pdf.pages[page_number]
-            template_page.merge_page(overlay_page)
-        output.add_page(template_page)
+def _copy_object(obj, numbers):
+    # Copia un objeto del overlay renumerando sus referencias indirectas
+    if isinstance(obj, IndirectObject):
+        return IndirectObject(numbers[obj.idnum], 0, None)
+    if isinstance(obj, StreamObject):
+        copy = EncodedStreamObject() if "/Filter" in obj else DecodedStreamObject()
+        copy._data = obj._data
+        copy.update({key: _copy_object(value, numbers) for key, value in obj.items()})
+        return copy
+    if isinstance(obj, DictionaryObject):
+        return DictionaryObject({key: _copy_object(value, numbers) for key, value in obj.items()})
+    if isinstance(obj, ArrayObject):
+        return ArrayObject(_copy_object(value, numbers) for value in obj)
+    return obj
+
+def _referenced_objects(pdf, obj, found):
+    pending = [obj]
+    while pending:
+        obj = pending.pop()
+        if isinstance(obj, IndirectObject):
+            if obj.idnum in found:
+                continue
+            found[obj.idnum] = pdf.get_object(obj)
+            obj = found[obj.idnum]
+        if isinstance(obj, DictionaryObject):
+            pending.extend(obj.values())
+        elif isinstance(obj, ArrayObject):
+            pending.extend(obj)
+    return found
+
+def _font_files(found):
+    # {digest del programa de fuente: número de objeto} de los FontFile2 entre los objetos encontrados
+    files = {}
+    for obj in found.values():
+        if isinstance(obj, DictionaryObject) and "/FontFile2" in obj:
+            reference = obj.raw_get("/FontFile2")
+            stream = found.get(reference.idnum)
+            if isinstance(stream, StreamObject):
+                files[reference.idnum] = hashlib.sha256(stream._data).digest()
+    return files
+
+@lru_cache(maxsize=16)
+def _template_fonts(template_pdf):
+    # Programas de fuente que ya trae el template (las capas estampadas usan los mismos). Solo
+    # se recorren /Font y los Form XObject: el resto de los recursos no hace falta parsearlo.
+    with _template_lock:
+        files = {}
+        pending = [page["/Resources"] for page in template_pdf.pages]
+        while pending:
+            resources = pending.pop().get_object()
+            for font in resources.get("/Font", DictionaryObject()).get_object().values():
+                font = font.get_object()
+                for font in [font] + [descendant.get_object() for descendant in font.get("/DescendantFonts", [])]:
+                    descriptor = font.get("/FontDescriptor")
+                    reference = descriptor.get_object().raw_get("/FontFile2") if descriptor and "/FontFile2" in descriptor.get_object() else None
+                    if isinstance(reference, IndirectObject):
+                        files.setdefault(hashlib.sha256(reference.get_object()._data).digest(), reference.idnum)
+            for xobject in resources.get("/XObject", DictionaryObject()).get_object().values():
+                xobject = xobject.get_object()
+                if xobject.get("/Subtype") == "/Form" and "/Resources" in xobject:
+                    pending.append(xobject["/Resources"])
+        return files
+
+def _overlay_form(overlay_page, next_number, fonts):
+    # Devuelve el Form XObject del overlay y los objetos que referencia, numerados desde next_number.
+    # Un FontFile2 idéntico a uno de fonts (digest -> número) se reutiliza en vez de copiarse.
+    overlay_pdf = overlay_page.pdf
+    resources = overlay_page.get("/Resources", DictionaryObject())
+    found = _referenced_objects(overlay_pdf, resources, {})
+
+    numbers = {}
+    for idnum, digest in _font_files(found).items():
+        if digest in fonts:
+            numbers[idnum] = fonts[digest]
+            del found[idnum]
+        else:
+            fonts[digest] = numbers[idnum] = next_number
+            next_number += 1
+    for idnum in found:
+        if idnum not in numbers:
+            numbers[idnum] = next_number
+            next_number += 1
+
+    contents = overlay_page.get_contents()
+    if isinstance(contents, StreamObject):
+        form = _copy_object(contents, numbers)
+    else:
+        form = DecodedStreamObject()
+        form.set_data(b"\n".join(stream.get_object().get_data() for stream in contents or []))
+
+    form[NameObject("/Type")] = NameObject("/XObject")
+    form[NameObject("/Subtype")] = NameObject("/Form")
+    form[NameObject("/BBox")] = ArrayObject(overlay_page.mediabox)
+    form[NameObject("/Resources")] = _copy_object(resources.get_object(), numbers)
+
+    objects = [(numbers[idnum], _copy_object(obj, numbers)) for idnum, obj in found.items()]
+    objects.append((next_number, form))
+    return next_number, objects, next_number + 1
+
+def _content_stream(data):
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    return stream
+
+def _xref_sections(numbers):
+    start = previous = numbers[0]
+    for number in numbers[1:]:
+        if number != previous + 1:
+            yield start, previous - start + 1
+            start = number
+        previous = number
+    yield start, previous - start + 1
+
+def _stamp(base, overlays):
+    # overlays[i] es la lista de páginas que se dibujan, en orden, sobre la página i del template
+    data, template_pdf = base
+
+    with _template_lock:
+        trailer = DictionaryObject(template_pdf.trailer)
+        pages_reference = template_pdf.trailer["/Root"].get_object().raw_get("/Pages")
+        pages_tree = DictionaryObject(pages_reference.get_object())
+        base_pages = []
+        for page in template_pdf.pages[:len(overlays)]:
+            resources = DictionaryObject(page["/Resources"].get_object())
+            xobjects = DictionaryObject(resources.get("/XObject", DictionaryObject()).get_object())
+            base_pages.append((page.indirect_reference.idnum, DictionaryObject(page), resources, xobjects))
+
+    next_number = int(trailer["/Size"])
+    objects = []
+    fonts = dict(_template_fonts(template_pdf))
+
+    for (page_number, page, resources, xobjects), overlay_pages in zip(base_pages, overlays):
+        if not overlay_pages:
+            continue
+
+        commands = ["Q"]
+        for overlay_page in overlay_pages:
+            form_number, form_objects, next_number = _overlay_form(overlay_page, next_number, fonts)
+            objects.extend(form_objects)
+
+            name = f"/SolicitudOverlay{form_number}"
+            xobjects[NameObject(name)] = IndirectObject(form_number, 0, None)
+            commands.append(f"q {name} Do Q")
+        resources[NameObject("/XObject")] = xobjects
+
+        contents = page.get("/Contents", ArrayObject())
+        if not isinstance(contents, ArrayObject):
+            contents = ArrayObject([contents])
+
+        objects.append((next_number, _content_stream(b"q\n")))
+        objects.append((next_number + 1, _content_stream(("\n" + "\n".join(commands) + "\n").encode())))
+        contents = ArrayObject(
+            [IndirectObject(next_number, 0, None)] + list(contents) + [IndirectObject(next_number + 1, 0, None)]
+        )
+        next_number += 2
+
+        page[NameObject("/Resources")] = resources
+        page[NameObject("/Contents")] = contents
+        objects.append((page_number, page))
+
+    # Páginas del overlay que el template no tiene (p. ej. continuación de la tabla de
+    # recargos): se crean páginas nuevas con el overlay y se agregan al árbol de páginas.
+    extra_pages = [pages for pages in overlays[len(base_pages):] if pages]
+    if extra_pages:
+        kids = ArrayObject(pages_tree["/Kids"])
+        for overlay_pages in extra_pages:
+            xobjects = DictionaryObject()
+            commands = []
+            for overlay_page in overlay_pages:
+                form_number, form_objects, next_number = _overlay_form(overlay_page, next_number, fonts)
+                objects.extend(form_objects)
+
+                name = f"/SolicitudOverlay{form_number}"
+                xobjects[NameObject(name)] = IndirectObject(form_number, 0, None)
+                commands.append(f"q {name} Do Q")
+
+            objects.append((next_number, _content_stream(("\n".join(commands) + "\n").encode())))
+            page = DictionaryObject({
+                NameObject("/Type"): NameObject("/Page"),
+                NameObject("/Parent"): IndirectObject(pages_reference.idnum, 0, None),
+                NameObject("/MediaBox"): ArrayObject(overlay_pages[0].mediabox),
+                NameObject("/Resources"): DictionaryObject({NameObject("/XObject"): xobjects}),
+                NameObject("/Contents"): IndirectObject(next_number, 0, None),
+            })
+            objects.append((next_number + 1, page))
+            kids.append(IndirectObject(next_number + 1, 0, None))
+            next_number += 2
+
+        pages_tree[NameObject("/Kids")] = kids
+        pages_tree[NameObject("/Count")] = NumberObject(int(pages_tree["/Count"]) + len(extra_pages))
+        objects.append((pages_reference.idnum, pages_tree))
+
+    output = BytesIO()
+    output.write(data)
+    if not data.endswith(b"\n"):
+        output.write(b"\n")
+
+    offsets = {}
+    for number, obj in objects:
+        offsets[number] = output.tell()
+        output.write(f"{number} 0 obj\n".encode())
+        obj.write_to_stream(output, None)
+        output.write(b"\nendobj\n")
+
+    xref_offset = output.tell()
+    output.write(b"xref\n")
+    numbers = sorted(offsets)
+    for start, count in _xref_sections(numbers):
+        output.write(f"{start} {count}\n".encode())
+        for number in range(start, start + count):
+            output.write(f"{offsets[number]:010d} 00000 n \n".encode())
+
+    updated_trailer = DictionaryObject({key: value for key, value in trailer.items() if key in ("/Root", "/Info", "/ID")})
+    updated_trailer[NameObject("/Size")] = NumberObject(next_number)
+    updated_trailer[NameObject("/Prev")] = NumberObject(int(data[data.rindex(b"startxref") + 9:].split()[0]))
+    output.write(b"trailer\n")
+    updated_trailer.write_to_stream(output, None)
+    output.write(f"\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+    return output.getvalue()
+
+def merge_pdfs(template, overlay, output_path=None):
+    # template puede ser una ruta (se usa la caché de templates) o un template ya cargado
+    if isinstance(overlay, bytes):
+        overlay = BytesIO(overlay)
+
+    base = load_template(template) if isinstance(template, str) else template
+    overlay_pdf = PyPDF2.PdfReader(overlay)
+
+    pdf_bytes = _stamp(base, [[page] for page in overlay_pdf.pages])
+
+    if output_path is None:
+        return pdf_bytes
 
     with open(output_path, "wb") as f_out:
-        output.write(f_out)
-
-def generate_pdf(data, template_path="resources/archives/Solicitud Anticipo-2.pdf", output_path="resources/archives/Solicitud.pdf", overlay_path="overlay.pdf"):
-    create_overlay(data, overlay_path)
-    merge_pdfs(template_path, overlay_path, output_path)
-    return output_path
\ No newline at end of file
+        f_out.write(pdf_bytes)
+    return output_path
+
+def generate_pdf(data, template_path=TEMPLATE_PATH, output_path=None, overlay_path=None, ledger=None):
+    # Por defecto todo el proceso ocurre en memoria y se devuelven los bytes del PDF;
+    # con output_path / overlay_path se conserva el flujo basado en archivos.
+    # data puede ser el dict de siempre (lote, JSON) o una SolicitudRequest.
+    if isinstance(data, SolicitudRequest):
+        ledger = data.surcharge_ledger if ledger is None else ledger
+        data = data.to_overlay()
+    with span("pdf.template"):
+        template = load_layered_template(template_path, user_data(data.get('commercial')))
+    with span("pdf.overlay"):
+        overlay = create_overlay(data, overlay_path, layered=True, ledger=ledger)
+    with span("pdf.merge"):
+        return merge_pdfs(template, overlay, output_path)
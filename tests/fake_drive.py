@@ -0,0 +1,125 @@
+"""Drive falso en memoria para probar services.drive_archive sin credenciales ni red.
+
+Implementa solo lo que usa el archivador: files().list(q=...) con las condiciones de nombre,
+tipo, carpeta padre, appProperties y trashed, y files().create(...) con execute() para
+carpetas y next_chunk() para subidas resumibles por partes. Uso:
+
+    from tests.fake_drive import FakeDrive
+    from services.drive_archive import DriveArchiver
+
+    drive = FakeDrive()
+    archiver = DriveArchiver(service_factory=lambda: drive)
+"""
+import itertools
+import re
+import threading
+from types import SimpleNamespace
+
+CONDITION = re.compile(
+    r"name = '((?:[^'\\]|\\.)*)'"
+    r"|mimeType = '([^']*)'"
+    r"|'([^']*)' in parents"
+    r"|appProperties has \{ key='([^']*)' and value='([^']*)' \}"
+    r"|trashed = false"
+)
+
+
+def _unquote(value):
+    return re.sub(r"\\(.)", r"\1", value)
+
+
+class _Request:
+    def __init__(self, result):
+        self._result = result
+
+    def execute(self, num_retries=0):
+        return self._result()
+
+
+class _UploadRequest:
+    def __init__(self, drive, body, media):
+        self.drive = drive
+        self.body = body
+        self.media = media
+        self.offset = 0
+        self.chunks = 0
+        self._content = bytearray()
+
+    def next_chunk(self, num_retries=0):
+        size = self.media.size()
+        chunk = self.media.getbytes(self.offset, self.media.chunksize())
+        self._content += chunk
+        self.offset += len(chunk)
+        self.chunks += 1
+        self.drive.chunks += 1
+        if self.offset < size:
+            return SimpleNamespace(resumable_progress=self.offset, total_size=size), None
+        return None, self.drive._store(self.body, bytes(self._content))
+
+
+class _Files:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def list(self, q="", **kwargs):
+        return _Request(lambda: {"files": self.drive.query(q)})
+
+    def create(self, body=None, media_body=None, **kwargs):
+        if media_body is not None:
+            return _UploadRequest(self.drive, body, media_body)
+        return _Request(lambda: self.drive._store(body, None))
+
+
+class FakeDrive:
+    def __init__(self):
+        self.files_by_id = {}
+        self.chunks = 0
+        self.lists = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def files(self):
+        return _Files(self)
+
+    def _store(self, body, content):
+        with self._lock:
+            file_id = f"fake{next(self._ids)}"
+            self.files_by_id[file_id] = {
+                "id": file_id,
+                "name": body.get("name", ""),
+                "mimeType": body.get("mimeType", "application/pdf"),
+                "parents": list(body.get("parents") or ["root"]),
+                "appProperties": dict(body.get("appProperties") or {}),
+                "content": content,
+            }
+        return {"id": file_id}
+
+    def _matches(self, item, query):
+        for match in CONDITION.finditer(query):
+            name, mime, parent, key, value = match.groups()
+            if name is not None and item["name"] != _unquote(name):
+                return False
+            if mime is not None and item["mimeType"] != mime:
+                return False
+            if parent is not None and parent not in item["parents"]:
+                return False
+            if key is not None and item["appProperties"].get(key) != value:
+                return False
+        return True
+
+    def query(self, q):
+        with self._lock:
+            self.lists += 1
+            return [
+                {"id": item["id"], "name": item["name"]}
+                for item in self.files_by_id.values() if self._matches(item, q)
+            ]
+
+    def path(self, file_id):
+        # Ruta legible de un archivo, para revisar la estructura de carpetas
+        parts = []
+        while file_id in self.files_by_id:
+            item = self.files_by_id[file_id]
+            parts.append(item["name"])
+            file_id = item["parents"][0]
+        return "/".join(reversed(parts))
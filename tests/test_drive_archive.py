@@ -0,0 +1,116 @@
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+import services.drive_archive as drive_archive
+from services.drive_archive import ROOT_FOLDER_NAME, DriveArchiver, pdf_filename
+from tests.fake_drive import FakeDrive
+
+@pytest.fixture
+def drive():
+    return FakeDrive()
+
+@pytest.fixture
+def archiver(drive):
+    archiver = DriveArchiver(service_factory=lambda: drive)
+    yield archiver
+    archiver.shutdown()
+
+def upload(archiver, content, commercial="Pedro Luis Bruges", date="2025-03-10", filename="Solicitud M1 - CLIENTE.pdf"):
+    return archiver.submit(content, filename, commercial, date).result(timeout=10)
+
+def test_folder_layout(archiver, drive):
+    first = upload(archiver, b"%PDF-1", date="2025-03-10")
+    second = upload(archiver, b"%PDF-2", commercial="Sharon Zuñiga", date="2025-03-10")
+    third = upload(archiver, b"%PDF-3", commercial="", date="2025-03-11")
+
+    assert drive.path(first) == f"{ROOT_FOLDER_NAME}/2025-03-10/Pedro Luis Bruges/Solicitud M1 - CLIENTE.pdf"
+    assert drive.path(second) == f"{ROOT_FOLDER_NAME}/2025-03-10/Sharon Zuñiga/Solicitud M1 - CLIENTE.pdf"
+    assert drive.path(third) == f"{ROOT_FOLDER_NAME}/2025-03-11/Sin comercial/Solicitud M1 - CLIENTE.pdf"
+    assert drive.files_by_id[first]["content"] == b"%PDF-1"
+
+    # Las carpetas se crean una sola vez: raíz, 2 fechas y 3 comerciales
+    folders = [item for item in drive.files_by_id.values() if item["content"] is None]
+    assert len(folders) == 6
+
+def test_configured_root_folder(drive):
+    root = drive._store({"name": "Archivo", "mimeType": drive_archive.FOLDER_MIME}, None)["id"]
+    archiver = DriveArchiver(service_factory=lambda: drive, root_folder_id=root)
+    try:
+        file_id = upload(archiver, b"%PDF-1")
+    finally:
+        archiver.shutdown()
+    assert drive.path(file_id) == "Archivo/2025-03-10/Pedro Luis Bruges/Solicitud M1 - CLIENTE.pdf"
+
+def test_date_folder_uses_bogota_time(archiver, drive, monkeypatch):
+    # Servidor en UTC: a las 03:00 UTC del 11 en Bogotá todavía son las 22:00 del 10
+    class ServerClock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            instant = datetime(2025, 3, 11, 3, 0, tzinfo=timezone.utc)
+            return instant.astimezone(tz) if tz else instant.replace(tzinfo=None)
+
+    monkeypatch.setattr(drive_archive, "datetime", ServerClock)
+    file_id = archiver.submit(b"%PDF-1", "a.pdf", "Pedro Luis Bruges").result(timeout=10)
+    assert drive.path(file_id) == f"{ROOT_FOLDER_NAME}/2025-03-10/Pedro Luis Bruges/a.pdf"
+
+def test_dedup_by_content_hash(archiver, drive):
+    first = upload(archiver, b"%PDF-same")
+    again = upload(archiver, b"%PDF-same", filename="otro nombre.pdf")
+    assert again == first
+    assert archiver.uploads == 1 and archiver.duplicates == 1
+
+    # Otro proceso (sin memoria de lo subido) lo encuentra por appProperties
+    other = DriveArchiver(service_factory=lambda: drive)
+    try:
+        assert upload(other, b"%PDF-same") == first
+    finally:
+        other.shutdown()
+    assert sum(item["content"] is not None for item in drive.files_by_id.values()) == 1
+
+def test_forgotten_hashes_are_found_in_drive(archiver, drive, monkeypatch):
+    monkeypatch.setattr(drive_archive, "UPLOADED_CACHE", 2)
+    ids = [upload(archiver, f"%PDF-{n}".encode()) for n in range(4)]
+    assert len(archiver._uploaded) == 2
+
+    assert upload(archiver, b"%PDF-0") == ids[0]
+    assert archiver.uploads == 4 and archiver.duplicates == 1
+
+def test_bounded_pool(drive):
+    release = threading.Event()
+
+    def blocked_service():
+        release.wait(10)
+        return drive
+
+    archiver = DriveArchiver(service_factory=blocked_service, workers=1, max_pending=2)
+    try:
+        futures = [archiver.submit(f"%PDF-{n}".encode(), f"{n}.pdf", "Pedro Luis Bruges", "2025-03-10") for n in range(3)]
+        # La tercera no espera: se descarta con la cola llena
+        assert futures[2] is None
+
+        release.set()
+        ids = [future.result(timeout=10) for future in futures[:2]]
+        assert all(ids)
+        assert archiver.submit(b"%PDF-3", "3.pdf", "Pedro Luis Bruges", "2025-03-10").result(timeout=10)
+    finally:
+        release.set()
+        archiver.shutdown()
+
+def test_failed_upload(capsys):
+    def broken_service():
+        raise ConnectionError("sin red")
+
+    archiver = DriveArchiver(service_factory=broken_service)
+    try:
+        assert archiver.submit(b"%PDF-1", "a.pdf", "Pedro Luis Bruges", "2025-03-10").result(timeout=10) is None
+    finally:
+        archiver.shutdown()
+    assert archiver.failures == 1
+    assert archiver.last_error == "ConnectionError: sin red"
+    assert "a.pdf" in capsys.readouterr().out
+
+def test_pdf_filename():
+    assert pdf_filename("M1/2", 'CLIENTE "A": B') == "Solicitud M1_2 - CLIENTE _A_ B.pdf"
+    assert pdf_filename("", "") == "Solicitud sin número - sin cliente.pdf"
@@ -0,0 +1,88 @@
+import pytest
+
+from services.models import SolicitudRequest
+from services.request_store import SHEET_HEADERS, RequestStore
+from services.request_history import COLUMNS
+
+ID_INDEX = COLUMNS.index("request_id")
+
+class FakeWorksheet:
+    def __init__(self):
+        self.rows = [SHEET_HEADERS]
+        self.fail_next = None
+
+    def append_row(self, row):
+        self.rows.append(row)
+
+    def append_rows(self, rows):
+        # "lost": las filas llegan pero la respuesta no (timeout); "failed": no llega nada
+        fail, self.fail_next = self.fail_next, None
+        if fail != "failed":
+            self.rows.extend(rows)
+        if fail:
+            raise TimeoutError("sin respuesta de Google Sheets")
+
+    def get(self, range_name, value_render_option=None):
+        # Rango de la columna de ids hasta el final ("P2:P")
+        start = int(range_name.split(":")[0][1:])
+        values = [[row[ID_INDEX]] for row in self.rows[start - 1:]]
+        while values and values[-1] == [""]:
+            values.pop()
+        return values
+
+    def ids(self):
+        return [row[ID_INDEX] for row in self.rows[1:]]
+
+class FakeSpreadsheet:
+    def __init__(self, worksheet):
+        self._worksheet = worksheet
+
+    def worksheet(self, name):
+        return self._worksheet
+
+@pytest.fixture
+def worksheet():
+    return FakeWorksheet()
+
+@pytest.fixture
+def store(tmp_path, worksheet):
+    spreadsheet = FakeSpreadsheet(worksheet)
+    return RequestStore(path=str(tmp_path / "requests.db"), open_spreadsheet=lambda: spreadsheet, batch_size=3)
+
+def save(store, count):
+    request = SolicitudRequest.from_dict({"commercial": "Pedro Luis Bruges", "client": "CLIENTE 1", "no_solicitud": "M1"})
+    return [store.save(request, "2025-03-15 10:00:00") for _ in range(count)]
+
+@pytest.mark.parametrize("failure", ["lost", "failed"])
+def test_reconcile_retry_does_not_duplicate(store, worksheet, failure):
+    ids = save(store, 5)
+
+    worksheet.fail_next = failure
+    with pytest.raises(TimeoutError):
+        store.reconcile()
+    assert store.pending() == 5
+
+    store.reconcile()
+    assert worksheet.ids() == ids
+    assert store.pending() == 0
+
+def test_reconcile_after_restart(store, worksheet, tmp_path):
+    # El proceso se cae después del envío: otra instancia sobre la misma base no reenvía
+    ids = save(store, 4)
+    worksheet.fail_next = "lost"
+    with pytest.raises(TimeoutError):
+        store.reconcile()
+
+    spreadsheet = FakeSpreadsheet(worksheet)
+    restarted = RequestStore(path=store.path, open_spreadsheet=lambda: spreadsheet, batch_size=3)
+    restarted.reconcile()
+    restarted.reconcile()
+    assert worksheet.ids() == ids
+    assert restarted.pending() == 0
+
+def test_reconcile_only_sends_new_requests(store, worksheet):
+    first = save(store, 2)
+    store.reconcile()
+    second = save(store, 2)
+    store.reconcile()
+    assert worksheet.ids() == first + second
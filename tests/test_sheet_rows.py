@@ -0,0 +1,104 @@
+import pytest
+
+from services.models import SolicitudRequest
+from services.reconstruct import request_from_record
+from services.request_history import COLUMNS
+from services.request_store import RequestStore
+from services.surcharge_ledger import parse_sheet_lines
+from services.trm_rates import TRMRates
+
+END_TIME = "2025-03-10 16:45:00"
+
+def make_request(**values):
+    data = {
+        "no_solicitud": "M1234", "commercial": "Pedro Luis Bruges", "client": "ÑANDÚ EXPORTACIONES SAS",
+        "customer_name": "Juan", "customer_phone": "321628", "customer_email": "juan@trading.com",
+        "container_type": ["20' Dry Standard", "40' Dry High Cube"], "transport_type": ["Flete Internacional", "Transporte Terrestre"],
+        "operation_type": "FCL", "reference": "Ref 1234",
+        "additional_surcharges": {
+            "20' Dry Standard": [
+                {"concept": "Flete", "currency": "USD", "cost": 1500.0},
+                {"concept": "Origen - Puerto: $ recargo", "currency": "COP", "cost": 1234567.89},
+            ],
+            "40' Dry High Cube": [
+                {"concept": "Manejo", "currency": "USD", "cost": 0.5},
+                {"concept": "Bodegaje árbol", "currency": "COP", "cost": 0.0},
+            ],
+        },
+        "trm": 4100.5, "total_cop_trm": "$7.385.317,89 COP",
+    }
+    data.update(values)
+    return SolicitudRequest.from_dict(data)
+
+def test_round_trip():
+    request = make_request()
+    parsed = SolicitudRequest.from_sheet_row(request.to_sheet_row(END_TIME, 7))
+
+    # La fecha impresa sale de la hora guardada en la fila
+    assert parsed.issue_date == "10/03/2025"
+    assert parsed.to_dict() == dict(request.to_dict(), issue_date="10/03/2025")
+    assert parsed.surcharge_ledger.by_currency == request.surcharge_ledger.by_currency
+
+def test_round_trip_without_trm():
+    request = make_request(trm=None, total_cop_trm="")
+    row = request.to_sheet_row(END_TIME)
+    assert SolicitudRequest.from_sheet_row(row).trm is None
+    # Celda vacía tal como la devuelve la hoja
+    row[COLUMNS.index("trm")] = ""
+    assert SolicitudRequest.from_sheet_row(row).trm is None
+
+def test_row_before_operation_number_column():
+    row = make_request().to_sheet_row(END_TIME)[:16]
+    assert SolicitudRequest.from_sheet_row(row).no_solicitud == ""
+    assert SolicitudRequest.from_sheet_row(row, "M99").no_solicitud == "M99"
+
+def test_parse_sheet_lines_skips_malformed_lines(capsys):
+    text = "\n".join([
+        "20' Dry Standard - Flete: $1,500.00 USD",
+        "Flete editado a mano 200 USD",
+        "",
+        "40' Dry High Cube - Origen: $200.00 COP",
+    ])
+    assert parse_sheet_lines(text) == [
+        ("20' Dry Standard", "Flete", "USD", 1500.0),
+        ("40' Dry High Cube", "Origen", "COP", 200.0),
+    ]
+    assert "Flete editado a mano" in capsys.readouterr().out
+
+def test_malformed_line_is_dropped_from_the_request(capsys):
+    row = make_request().to_sheet_row(END_TIME)
+    surcharges = COLUMNS.index("surcharges")
+    row[surcharges] += "\nnota sin formato"
+    parsed = SolicitudRequest.from_sheet_row(row)
+    assert sum(len(items) for items in parsed.surcharges.values()) == 4
+    assert "nota sin formato" in capsys.readouterr().out
+
+@pytest.mark.parametrize("empty", ["", None])
+def test_row_without_surcharges(empty):
+    row = make_request(additional_surcharges={}).to_sheet_row(END_TIME)
+    row[COLUMNS.index("surcharges")] = empty
+    assert SolicitudRequest.from_sheet_row(row).surcharges == {}
+
+def record_of(request, request_id=""):
+    return dict(zip(COLUMNS, request.to_sheet_row(END_TIME, request_id)))
+
+def test_request_from_record_prefers_the_local_store(tmp_path):
+    store = RequestStore(path=str(tmp_path / "requests.db"), open_spreadsheet=None)
+    request = make_request(reference="guardada localmente")
+    request_id = store.save(request, END_TIME)
+
+    # La fila de la hoja se editó a mano; el registro local manda
+    record = record_of(make_request(reference="editada en la hoja"), request_id)
+    rebuilt = request_from_record(record, store=store)
+    assert rebuilt.reference == "guardada localmente"
+    assert rebuilt.issue_date == "10/03/2025"
+
+    # Sin registro local (otra máquina) se arma desde la fila
+    assert request_from_record(record).reference == "editada en la hoja"
+
+def test_request_from_record_fills_missing_trm(tmp_path):
+    rates = TRMRates(path=str(tmp_path / "trm.csv"), source=None)
+    rates.add([("2025-03-07", 4100.0)])
+    record = record_of(make_request(trm=None, total_cop_trm=""))
+    assert request_from_record(record, rates=rates).trm == 4100.0
+    assert request_from_record(record).trm is None
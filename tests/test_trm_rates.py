@@ -0,0 +1,95 @@
+import math
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from services.models import SolicitudRequest
+from services.trm_rates import MAX_AGE_DAYS, TRMRates, fill_trm, reprice
+
+# Viernes 7, lunes 10 y martes 11 de marzo de 2025 (sin TRM propia el fin de semana)
+ROWS = [(date(2025, 3, 10), 4110.0), (date(2025, 3, 7), 4100.0), (date(2025, 3, 11), 4120.0)]
+
+@pytest.fixture
+def rates(tmp_path):
+    rates = TRMRates(path=str(tmp_path / "trm.csv"), source=None)
+    rates.add(ROWS)
+    return rates
+
+def test_rate_for(rates):
+    assert rates.rate_for(date(2025, 3, 6)) is None
+    assert rates.rate_for(date(2025, 3, 7)) == (date(2025, 3, 7), 4100.0)
+    # El fin de semana rige la del viernes
+    assert rates.rate_for(date(2025, 3, 9)) == (date(2025, 3, 7), 4100.0)
+    assert rates.rate_for(date(2025, 3, 10)) == (date(2025, 3, 10), 4110.0)
+    assert rates.rate_for("2025-03-11") == (date(2025, 3, 11), 4120.0)
+
+def test_rate_for_stale_table(rates):
+    assert rates.rate_for(date(2025, 3, 11 + MAX_AGE_DAYS)) == (date(2025, 3, 11), 4120.0)
+    assert rates.rate_for(date(2025, 3, 12 + MAX_AGE_DAYS)) is None
+    assert rates.rate_for(date(2025, 3, 20), max_age=30) == (date(2025, 3, 11), 4120.0)
+
+def test_empty_table(tmp_path):
+    rates = TRMRates(path=str(tmp_path / "trm.csv"), source=None)
+    assert len(rates) == 0
+    assert rates.latest() is None
+    assert rates.rate_for(date(2025, 3, 10)) is None
+
+def test_add_replaces_a_date_and_persists(rates):
+    assert rates.add([(date(2025, 3, 10), 4110.0)]) == 0
+    assert rates.add([("2025-03-10", 4115.5), (date(2025, 3, 12), 4130.0)]) == 2
+    assert rates.rate_for(date(2025, 3, 10)) == (date(2025, 3, 10), 4115.5)
+
+    reloaded = TRMRates(path=rates.path, source=None)
+    assert len(reloaded) == 4
+    assert reloaded.rate_for(date(2025, 3, 10)) == (date(2025, 3, 10), 4115.5)
+    assert reloaded.latest() == (date(2025, 3, 12), 4130.0)
+
+def test_refresh_asks_only_for_new_dates(tmp_path):
+    calls = []
+
+    def source(since):
+        calls.append(since)
+        return [(date(2025, 3, 11), 4120.0), (date(2025, 3, 12), 4130.0)]
+
+    rates = TRMRates(path=str(tmp_path / "trm.csv"), source=source)
+    rates.add(ROWS)
+    assert rates.refresh() == 1
+    assert calls == [date(2025, 3, 11)]
+    assert rates.latest() == (date(2025, 3, 12), 4130.0)
+
+def test_reprice(rates):
+    frame = pd.DataFrame({
+        "time": ["2025-03-10 16:00:00", "2025-03-06 09:00:00", "2025-03-08 10:30:00", "", "2025-03-11 08:00:00"],
+        "total_usd": [100.0, 100.0, 10.0, 5.0, 0.0],
+        "total_cop": [50.0, 0.0, 0.0, 0.0, 70.0],
+    })
+    repriced = reprice(frame, rates)
+
+    trm = repriced["trm_table"].tolist()
+    assert trm[0] == 4110.0 and trm[2] == 4100.0 and trm[4] == 4120.0
+    # Antes de la primera fecha o sin hora: sin TRM
+    assert math.isnan(trm[1]) and math.isnan(trm[3])
+
+    totals = repriced["total_cop_table"].tolist()
+    assert totals[0] == 100.0 * 4110.0 + 50.0
+    assert totals[2] == 10.0 * 4100.0
+    assert totals[4] == 70.0
+    assert math.isnan(totals[1])
+    assert list(repriced.columns[:3]) == ["time", "total_usd", "total_cop"]
+
+def make_request(currencies, trm=None, issue_date="09/03/2025"):
+    return SolicitudRequest.from_dict({
+        "additional_surcharges": {"20' Dry Standard": [{"concept": "Flete", "currency": currency, "cost": 10.0} for currency in currencies]},
+        "trm": trm, "issue_date": issue_date,
+    })
+
+def test_fill_trm(rates):
+    assert fill_trm(make_request(["USD", "COP"]), rates).trm == 4100.0
+    assert fill_trm(make_request(["USD", "COP"], issue_date="11/03/2025"), rates).trm == 4120.0
+
+def test_fill_trm_leaves_other_requests_alone(rates):
+    assert fill_trm(make_request(["USD", "COP"], trm=3999.0), rates).trm == 3999.0
+    assert fill_trm(make_request(["USD"]), rates).trm is None
+    assert fill_trm(make_request(["USD", "COP"], issue_date="01/01/2025"), rates).trm is None
+    assert fill_trm(make_request(["USD", "COP"]), None).trm is None
@@ -0,0 +1,78 @@
+import io
+
+import pytest
+from PyPDF2 import PdfReader
+
+from services.write_pdf import TEMPLATE_PATH, generate_pdf
+
+CONTAINER = "20' Dry Standard"
+
+def make_request(surcharges):
+    return {
+        "no_solicitud": "M1234", "commercial": "Pedro Luis Bruges", "client": "ÑANDÚ EXPORTACIONES SAS",
+        "customer_name": "Juan", "customer_phone": "321628", "customer_email": "juan@trading.com",
+        "container_type": [CONTAINER], "transport_type": ["Flete Internacional", "Transporte Terrestre"],
+        "operation_type": "FCL", "reference": "Ref 1234", "issue_date": "15/03/2025",
+        "additional_surcharges": {CONTAINER: surcharges}, "trm": 4100.5, "total_cop_trm": "$410.250,00 COP",
+    }
+
+def text_of(reader):
+    return "\n".join(page.extract_text() for page in reader.pages)
+
+def check_xref(pdf_bytes):
+    # Cada entrada en uso de la tabla xref (incluidas las de la actualización incremental)
+    # apunta al "N G obj" de ese objeto
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    checked = 0
+    for generation, entries in reader.xref.items():
+        for number, offset in entries.items():
+            if number == 0:
+                continue
+            header = f"{number} {generation} obj".encode()
+            assert pdf_bytes[offset:offset + len(header)] == header, f"xref de {number} {generation} R apunta a {offset}"
+            checked += 1
+    assert checked
+
+@pytest.fixture(scope="module")
+def one_page():
+    surcharges = [
+        {"concept": "Flete", "currency": "USD", "cost": 100.0},
+        {"concept": "Origen", "currency": "COP", "cost": 200.0},
+    ]
+    return generate_pdf(make_request(surcharges))
+
+@pytest.fixture(scope="module")
+def multi_page():
+    surcharges = [{"concept": f"Recargo {n} árbol", "currency": "USD", "cost": 1.5 * n} for n in range(60)]
+    return generate_pdf(make_request(surcharges))
+
+def test_one_page(one_page):
+    reader = PdfReader(io.BytesIO(one_page))
+    assert len(reader.pages) == len(PdfReader(TEMPLATE_PATH).pages) == 1
+
+    text = text_of(reader)
+    for expected in ("M1234", "15/03/2025", "ÑANDÚ EXPORTACIONES SAS", "Flete Internacional, Transporte Terrestre",
+                     "$100.00", "$200.00", "$410.250,00 COP", "TRM: $4100.5"):
+        assert expected in text
+
+def test_multi_page(multi_page):
+    reader = PdfReader(io.BytesIO(multi_page))
+    assert len(reader.pages) == 3
+
+    text = text_of(reader)
+    for n in range(60):
+        assert f"Recargo {n} árbol" in text
+    assert "$2655.00" in reader.pages[-1].extract_text()
+    # El encabezado de la solicitud se repite en todas las páginas
+    for page in reader.pages:
+        assert "M1234" in page.extract_text()
+
+@pytest.mark.parametrize("document", ["one_page", "multi_page"])
+def test_structure(document, request):
+    pdf_bytes = request.getfixturevalue(document)
+    assert pdf_bytes.startswith(b"%PDF-") and pdf_bytes.rstrip().endswith(b"%%EOF")
+    check_xref(pdf_bytes)
+
+    pikepdf = pytest.importorskip("pikepdf")
+    with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
+        assert pdf.check_pdf_syntax() == []
@@ -0,0 +1,171 @@
+import math
+from datetime import datetime, time
+from io import BytesIO
+
+import streamlit as st
+
+from services.pdf_cache import cached_generate_pdf
+from services.reconstruct import reconstruct_batch, request_from_record
+from services.request_history import get_request_history
+from services.request_store import get_request_store
+from services.trm_rates import get_trm_rates, reprice
+
+PAGE_SIZES = [25, 50, 100]
+BULK_LIMIT = 500
+
+REPRICE_COLUMNS = {
+    "sheet_row": "Row",
+    "time": "Time",
+    "client": "Cliente",
+    "total_usd": "Total USD",
+    "total_cop": "Total COP",
+    "trm": "TRM",
+    "trm_table": "TRM (table)",
+    "total_cop_table": "Total en COP TRM (table)",
+}
+
+DISPLAY_COLUMNS = {
+    "time": "Time",
+    "commercial": "Commercial",
+    "client": "Cliente",
+    "customer_name": "Customer Name",
+    "container_type": "Container Type",
+    "transport_type": "Service Type",
+    "operation_type": "Operation Type",
+    "reference": "Reference",
+    "total_usd": "Total USD",
+    "total_cop": "Total COP",
+    "trm": "TRM",
+    "total_cop_trm": "Total en COP TRM",
+}
+
+def show(role, rep=None):
+    # rep: los comerciales solo ven sus propias solicitudes (admin e inside ven todas)
+    st.title("Request History")
+    if role == "commercial" and not rep:
+        st.info("Your user has no sales rep profile, so there are no requests to show.")
+        return
+
+    history = get_request_history()
+
+    col1, col2 = st.columns([4, 1])
+    with col2:
+        if st.button("Refresh"):
+            history.current(max_age=0)
+
+    try:
+        index = history.current()
+    except Exception as e:
+        st.error(f"Error al leer el historial desde Google Sheets: {e}")
+        return
+
+    with col1:
+        if history.last_refresh is not None:
+            st.caption(f"{len(index.frame)} solicitudes cargadas.")
+
+    with st.expander("**Filters**", expanded=True):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if role == "commercial":
+                commercials = [rep]
+                st.text_input("Sales Rep", value=rep, disabled=True)
+            else:
+                commercials = st.multiselect("Sales Rep", index.commercials(), key="history_commercials")
+        with col2:
+            client_query = st.text_input("Client", key="history_client", placeholder="Type part of the client's name")
+        with col3:
+            dates = st.date_input("Date range", value=(), key="history_dates")
+
+    start = dates[0] if len(dates) > 0 else None
+    # El rango incluye todo el último día (hasta 23:59:59.999999, no la medianoche siguiente)
+    end = datetime.combine(dates[1], time.max) if len(dates) > 1 else None
+
+    positions = index.filter(commercials, client_query, start, end)
+
+    col1, col2, col3 = st.columns([1, 1, 3])
+    with col1:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key="history_page_size")
+    pages = max(1, math.ceil(len(positions) / page_size))
+
+    # Si los filtros dejaron menos páginas, se vuelve a la última que existe
+    if st.session_state.get("history_page", 1) > pages:
+        st.session_state["history_page"] = pages
+    with col2:
+        page = st.number_input("Page", min_value=1, max_value=pages, step=1, key="history_page")
+    with col3:
+        st.caption(f"{len(positions)} resultados · página {page} de {pages}")
+
+    rows = index.page(positions, page, page_size)
+    st.dataframe(
+        rows[list(DISPLAY_COLUMNS)].rename(columns=DISPLAY_COLUMNS),
+        hide_index=True,
+        use_container_width=True,
+        column_config={"Time": st.column_config.DatetimeColumn(format="YYYY-MM-DD HH:mm:ss")},
+    )
+
+    with st.expander("**Re-price with TRM table**"):
+        rates = get_trm_rates()
+        latest = rates.latest()
+        st.caption(
+            f"{len(rates)} rates in the table, latest {latest[0]:%Y-%m-%d}: ${latest[1]:,.2f}." if latest
+            else "The TRM table is empty."
+        )
+        if st.button("Re-price filtered requests", disabled=not latest or not len(positions)):
+            # Todas las filas filtradas en una sola operación (merge_asof), no fila por fila
+            repriced = reprice(index.page(positions, 1, len(positions)), rates)[list(REPRICE_COLUMNS)]
+            st.caption(f"{int(repriced['trm_table'].notna().sum())} of {len(repriced)} requests have a rate in the table.")
+            st.download_button(
+                label="Download CSV",
+                data=repriced.rename(columns=REPRICE_COLUMNS).to_csv(index=False).encode("utf-8"),
+                file_name="Solicitudes re-priced.csv",
+                mime="text/csv",
+            )
+
+    with st.expander("**Regenerate PDF**"):
+        if rows.empty:
+            st.caption("No results on this page.")
+        else:
+            records = rows.to_dict("records")
+            labels = {
+                record["sheet_row"]: f"Row {record['sheet_row']} · {record['time']:%Y-%m-%d %H:%M} · {record['client']}"
+                if record["time"] == record["time"] else f"Row {record['sheet_row']} · {record['client']}"
+                for record in records
+            }
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                sheet_row = st.selectbox("Request", list(labels), format_func=labels.get, key="history_regenerate_row")
+            with col2:
+                # Vacío: el de la fila o el del registro local (las filas viejas no lo traen)
+                no_solicitud = st.text_input("Operation Number (M)", key="history_regenerate_no")
+
+            if st.button("Regenerate PDF"):
+                record = next(record for record in records if record["sheet_row"] == sheet_row)
+                try:
+                    pdf_bytes = cached_generate_pdf(request_from_record(record, no_solicitud, get_request_store(), get_trm_rates()))
+                except Exception as e:
+                    st.error(f"No se pudo regenerar el PDF: {e}")
+                else:
+                    st.download_button(
+                        label="Download PDF",
+                        data=pdf_bytes,
+                        file_name=f"Solicitud de Anticipo - fila {sheet_row}.pdf",
+                        mime="application/pdf",
+                    )
+
+        if role == "admin":
+            st.divider()
+            st.caption(f"Bulk: all {len(positions)} filtered requests in one ZIP (max {BULK_LIMIT}).")
+            if st.button("Regenerate all as ZIP", disabled=not 0 < len(positions) <= BULK_LIMIT):
+                output = BytesIO()
+                with st.spinner("Generating PDFs..."):
+                    summary = reconstruct_batch(
+                        index.page(positions, 1, len(positions)).to_dict("records"), output, store=get_request_store(), rates=get_trm_rates()
+                    )
+                for error in summary["errors"]:
+                    st.warning(f"{error['file']}: {error['error']}")
+                st.download_button(
+                    label=f"Download ZIP ({summary['documents']} PDFs)",
+                    data=output.getvalue(),
+                    file_name="Solicitudes de Anticipo.zip",
+                    mime="application/zip",
+                )
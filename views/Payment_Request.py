@@ -1,86 +1,25 @@
 import streamlit as st
-import pandas as pd
-from services.utils import *
 from datetime import datetime
 import pytz
-from services.write_pdf import generate_pdf
+from services.pdf_cache import cached_generate_pdf
+from services.drive_archive import archive_pdf
+from services.request_store import get_request_store
+from services.operation_index import get_operation_index
+from services.client_store import get_client_index, get_client_replica, client_exists, add_client
+from services.client_index import ClientIndex
+from services.surcharge_ledger import SurchargeLedger
+from services.models import SolicitudRequest, Surcharge
 import math
+import time
+from services.rerun_timing import last_timing, record_run
+from services.tracing import span
+from services.trm_rates import get_trm_rates
 
 colombia_timezone = pytz.timezone('America/Bogota')
 
-def save_to_google_sheets(data, start_time):
-    SPREADSHEET_ID = st.secrets['general']['time_sheet_id']
-    SHEET_NAME = "SOLICITUD DE ANTICIPO"
-
-    credentials = Credentials.from_service_account_info(
-        st.secrets["google_sheets_credentials"],
-        scopes=["https://www.googleapis.com/auth/spreadsheets", 
-                "https://www.googleapis.com/auth/drive"]
-    )
-
-    gc = gspread.authorize(credentials)
-    try:
-        sheet = gc.open_by_key(SPREADSHEET_ID)
-        try:
-            worksheet = sheet.worksheet(SHEET_NAME)
-        except gspread.exceptions.WorksheetNotFound:
-            worksheet = sheet.add_worksheet(title=SHEET_NAME, rows="1000", cols="30")
-            st.warning(f"Worksheet '{SHEET_NAME}' was created.")
-            headers = [
-                "Time", "Commercial", "Cliente", "Customer Name", "Customer Phone", "Customer Email", "Container Type", "Service Type",
-                "Operation Type", "Reference", "Surcharges", "Total USD", "Total COP", "TRM", "Total en COP TRM"
-            ]
-
-            worksheet.append_row(headers)
-    except gspread.exceptions.SpreadsheetNotFound:
-        st.error("The specified Google Sheets document was not found.")
-        return
-
-    client = data["client"]
-    customer_name = data["customer_name"]
-    customer_phone = data["customer_phone"]
-    customer_email = data["customer_email"]
-
-    operation_type = data["operation_type"]
-    reference = data["reference"]
-    commercial = data["commercial"]
-
-    trm = data["trm"]
-    total_cop_trm = data["total_cop_trm"]
-
-    container_list = data['container_type']
-    containers = [
-        '\n'.join(x) if isinstance(x, list) else x
-        for x in container_list
-    ]
-    containers_str = '\n'.join(containers)
-
-    transport_list = data['transport_type']
-    transports = [
-        '\n'.join(x) if isinstance(x, list) else x
-        for x in transport_list
-    ]
-    transport_str = '\n'.join(transports)
-
-    additional_surcharge_costs = []
-    usd_total = 0.0
-    cop_total = 0.0
-
-    for container_type, surcharges in data["additional_surcharges"].items():
-        for add_surcharge in surcharges:
-            cost = add_surcharge['cost']
-            currency = add_surcharge['currency']
-            concept = add_surcharge['concept']
-            additional_surcharge_costs.append(
-                f"{container_type} - {concept}: ${cost:.2f} {currency}"
-            )
-            if currency == 'USD':
-                usd_total += cost
-            elif currency == 'COP':
-                cop_total += cost
-
-    additional_surcharge_costs_str = "\n".join(additional_surcharge_costs)
+CLIENT_RESULTS = 50
 
+def save_request(request, start_time):
     st.session_state["end_time"] = datetime.now(pytz.utc).astimezone(colombia_timezone)
     end_time = st.session_state.get("end_time", None)
     if end_time is not None:
@@ -89,32 +28,132 @@ def save_to_google_sheets(data, start_time):
         st.error("Error: 'end_time' no fue asignado correctamente.")
         return
 
-    row = [
-        commercial, end_time_str, client, customer_name, customer_phone, customer_email, containers_str, 
-        transport_str, operation_type, reference, additional_surcharge_costs_str, usd_total, cop_total, trm, total_cop_trm
-    ]
-    worksheet.append_row(row)
+    # Se guarda en el registro local y se copia a Sheets en segundo plano (services.request_store)
+    return get_request_store().save(request, end_time_str)
+
+def new_surcharge():
+    # Cada fila tiene un id estable: las llaves de sus widgets no se corren al borrar otra fila
+    st.session_state["surcharge_next_id"] = st.session_state.get("surcharge_next_id", 0) + 1
+    return Surcharge(id=st.session_state["surcharge_next_id"])
+
+def remove_surcharge(container, row_id):
+    rows = st.session_state["additional_surcharges"][container]
+    rows[:] = [row for row in rows if row.id != row_id]
+
+def add_surcharge(container):
+    st.session_state["additional_surcharges"][container].append(new_surcharge())
+
+@st.fragment
+def surcharge_editor(container_type, show_timing=False):
+    # Fragmento: editar un recargo vuelve a correr solo esta sección, no toda la app.
+    # En una corrida completa devuelve lo que necesita el resto de la página.
+    start = time.perf_counter()
+
+    with st.expander("**Surcharges**", expanded=True):
+
+        if "additional_surcharges" not in st.session_state or not isinstance(st.session_state["additional_surcharges"], dict):
+            st.session_state["additional_surcharges"] = {}
+
+        all_surcharges = []
+        for cont in container_type:
+            if cont not in st.session_state["additional_surcharges"]:
+                st.session_state["additional_surcharges"][cont] = []
+
+            all_surcharges.extend(st.session_state["additional_surcharges"][cont])
+
+        currencies = {s.currency for s in all_surcharges if s.currency}
+
+        need_trm = "USD" in currencies and "COP" in currencies
+
+        if need_trm:
+            # La TRM vigente hoy sale de la tabla (services.trm_rates); el comercial puede cambiarla
+            official = get_trm_rates().rate_for(datetime.now(colombia_timezone).date())
+            if official and not st.session_state.get("trm"):
+                st.session_state["trm"] = official[1]
+            trm = st.number_input("Enter TRM (USD to COP)*", min_value=0.0, step=0.01, key="trm")
+            if official:
+                st.caption(f"Official TRM since {official[0]:%Y-%m-%d}: ${official[1]:,.2f}")
+            else:
+                st.caption("No official TRM available for today; enter it manually.")
+        else:
+            trm = None
+
+        currency_total = "COP" if currencies == {"COP"} else "USD" if currencies == {"USD"} else "COP"
+
+        for cont in container_type:
+            st.write(f"**{cont}**")
+
+            for surcharge in st.session_state["additional_surcharges"][cont]:
+                row_id = surcharge.id
+                col1, col2, col3, col4 = st.columns([2.5, 1, 0.5, 0.5])
+
+                with col1:
+                    surcharge.concept = st.text_input(f"Concept*", surcharge.concept, key=f'surcharge_{row_id}_concept')
+
+                with col2:
+                    surcharge.currency = st.selectbox(f"Currency*", ['USD', 'COP'], index=0 if surcharge.currency == "USD" else 1, key=f'surcharge_{row_id}_currency')
+
+                with col3:
+                    surcharge.cost = st.number_input(f"Cost*", min_value=0.0, step=0.01, value=surcharge.cost, key=f'surcharge_{row_id}_cost')
+
+                with col4:
+                    st.write(" ")
+                    st.write(" ")
+                    st.button("❌", key=f'remove_surcharge_{row_id}', on_click=remove_surcharge, args=(cont, row_id))
+
+            st.button(f"➕ Add Surcharges", key=f"add_{cont}", on_click=add_surcharge, args=(cont,))
+
+        # Solo los contenedores seleccionados; el mismo libro sirve para el total, la fila de Sheets y el PDF
+        surcharges = {
+            cont: tuple(row.validated() for row in st.session_state["additional_surcharges"][cont])
+            for cont in container_type
+        }
+        ledger = SurchargeLedger.from_records(
+            (cont, row.concept, row.currency, row.cost) for cont, rows in surcharges.items() for row in rows
+        )
+        total = ledger.converted_total(trm if need_trm else None)
+
+        total_rounded = math.ceil(total * 100) / 100
+        symbol = "$" if currency_total == "USD" else "$"
+        suffix = "USD" if currency_total == "USD" else "COP"
+        formatted_total = f"{symbol}{total_rounded:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") + f" {suffix}"
+        st.markdown(f"### **Total: {formatted_total}**")
+
+        record_run("surcharges", start)
+        if show_timing:
+            st.caption(f"⏱ Surcharges section: {last_timing('surcharges')['ms']} ms")
+
+    return trm, formatted_total, surcharges, ledger
+
+def save_new_client(client_index):
+    # Callback del botón: el valor de un widget con key solo se puede cambiar antes de crearlo
+    new_client_name = st.session_state.get("new_client_name", "")
+    if not new_client_name:
+        st.session_state["new_client_feedback"] = ("error", "⚠️ Please enter a valid client name.")
+    elif new_client_name in client_index:
+        st.session_state["new_client_feedback"] = ("warning", f"⚠️ Client '{new_client_name}' already exists in the list.")
+    else:
+        st.session_state["client"] = new_client_name
+        st.session_state["new_client_saved"] = True
+        st.session_state["new_client_feedback"] = ("success", f"✅ Client '{new_client_name}' saved!")
 
 def show(role):
     if "client" not in st.session_state:
         st.session_state["client"] = None
 
-    if "clients_list" not in st.session_state:
-        st.session_state["clients_list"] = []
-
-    if not st.session_state["clients_list"]:
-        try:
-            client_data = load_clients()
-            st.session_state["clients_list"] = client_data if client_data else []
-        except Exception as e:
-            st.error(f"Error al cargar la lista de clientes: {e}")
-            st.session_state["clients_list"] = []
+    try:
+        client_index = get_client_index()
+        replica = get_client_replica()
+        if replica.last_error and not len(client_index):
+            st.error(f"Error al cargar los clientes desde Google Sheets: {replica.last_error}")
+    except Exception as e:
+        st.error(f"Error al cargar la lista de clientes: {e}")
+        client_index = ClientIndex([])
 
     if st.session_state.get("start_time") is None:
         st.session_state["start_time"] = datetime.now(colombia_timezone)
 
     start_time = st.session_state["start_time"]
-    clients_list = st.session_state.get("clients_list", [])
 
     col1, col2 = st.columns(2)
 
@@ -127,27 +166,35 @@ def show(role):
     with col2:
         no_solicitud = st.text_input("Operation Number (M)*", key="no_solicitud")
 
+        # Consulta en memoria (services.operation_index), sin leer la hoja
+        operation_index = get_operation_index()
+        duplicate = bool(no_solicitud.strip()) and no_solicitud in operation_index
+        if duplicate:
+            st.warning(f"⚠️ Operation number '{no_solicitud}' was already submitted.")
+
     with st.expander("**Client Information**",expanded=True):
-        client = st.selectbox("Select your Client*", [" "] + ["+ Add New"] + clients_list, key="client")
+        # Solo se envían al navegador las coincidencias de la búsqueda, no la lista completa
+        client_search = st.text_input("Search Client", key="client_search", placeholder="Type part of the client's name")
+        client_options = client_index.search(client_search, CLIENT_RESULTS)
+
+        selected_client = st.session_state.get("client")
+        if selected_client not in (None, " ", "+ Add New") and selected_client not in client_options:
+            client_options = [selected_client] + client_options
+
+        client = st.selectbox("Select your Client*", [" "] + ["+ Add New"] + client_options, key="client")
 
         new_client_saved = st.session_state.get("new_client_saved", False)
 
         if client == "+ Add New":
             st.write("### Add a New Client")
-            new_client_name = st.text_input("Enter the client's name:", key="new_client_name")
-
-            if st.button("Save Client"):
-                if new_client_name:
-                    if new_client_name not in st.session_state["clients_list"]:
-                        st.session_state["clients_list"].append(new_client_name)
-                        st.session_state["client"] = new_client_name
-                        st.session_state["new_client_saved"] = True
-                        st.success(f"✅ Client '{new_client_name}' saved!")
-                        st.rerun()
-                    else:
-                        st.warning(f"⚠️ Client '{new_client_name}' already exists in the list.")
-                else:
-                    st.error("⚠️ Please enter a valid client name.")
+            st.text_input("Enter the client's name:", key="new_client_name")
+
+            st.button("Save Client", on_click=save_new_client, args=(client_index,))
+
+        # Resultado del callback de "Save Client" (corre antes de que se cree el selectbox)
+        feedback = st.session_state.pop("new_client_feedback", None)
+        if feedback:
+            getattr(st, feedback[0])(feedback[1])
 
         col1, col2, col3 = st.columns(3)
 
@@ -179,110 +226,63 @@ def show(role):
         with col6:
             reference = st.text_input("Customer Reference", key="reference")
 
-    with st.expander("**Surcharges**", expanded=True):
-
-        if "additional_surcharges" not in st.session_state or not isinstance(st.session_state["additional_surcharges"], dict):
-            st.session_state["additional_surcharges"] = {}
-
-        def remove_surcharge(container, index):
-            del st.session_state["additional_surcharges"][container][index]
-
-        def add_surcharge(container):
-            st.session_state["additional_surcharges"][container].append({"concept": "", "currency": "", "cost": 0.0})
-
-        all_surcharges = []
-        for cont in container_type:
-            if cont not in st.session_state["additional_surcharges"]:
-                st.session_state["additional_surcharges"][cont] = []
-
-            all_surcharges.extend(st.session_state["additional_surcharges"][cont])
-
-        currencies = {s["currency"] for s in all_surcharges if s["currency"]}
-
-        need_trm = "USD" in currencies and "COP" in currencies
-
-        if need_trm:
-            trm = st.number_input("Enter TRM (USD to COP)*", min_value=0.0, step=0.01, key="trm")
-        else:
-            trm = None
-
-        total = 0
-        currency_total = "COP" if currencies == {"COP"} else "USD" if currencies == {"USD"} else "COP"
-
-        for cont in container_type:
-            st.write(f"**{cont}**")
-
-            for i, surcharge in enumerate(st.session_state["additional_surcharges"][cont]):
-                col1, col2, col3, col4 = st.columns([2.5, 1, 0.5, 0.5])
-
-                with col1:
-                    surcharge["concept"] = st.text_input(f"Concept*", surcharge["concept"], key=f'{cont}_concept_{i}')
-
-                with col2:
-                    surcharge["currency"] = st.selectbox(f"Currency*", ['USD', 'COP'], index=0 if surcharge["currency"] == "USD" else 1, key=f'{cont}_currency_{i}')
-
-                with col3:
-                    surcharge["cost"] = st.number_input(f"Cost*", min_value=0.0, step=0.01, value=surcharge["cost"], key=f'{cont}_cost_{i}')
-
-                with col4:
-                    st.write(" ")
-                    st.write(" ")
-                    st.button("❌", key=f'remove_{cont}_{i}', on_click=remove_surcharge, args=(cont, i))
-
-                if surcharge["currency"] == "USD":
-                    total += surcharge["cost"] * (trm if need_trm else 1)
-                else:
-                    total += surcharge["cost"]
+    trm, formatted_total, surcharges, ledger = surcharge_editor(container_type, show_timing=role == "admin")
+
+    request = SolicitudRequest(
+        no_solicitud=no_solicitud,
+        commercial=commercial,
+        client=st.session_state.get("client", client),
+        customer_name=customer_name,
+        customer_phone=customer_phone,
+        customer_email=customer_email,
+        container_type=container_type,
+        transport_type=transport_type,
+        operation_type=operation_type,
+        reference=reference,
+        surcharges=surcharges,
+        trm=trm,
+        total_cop_trm=formatted_total,
+        ledger=ledger,
+    )
 
-            st.button(f"➕ Add Surcharges", key=f"add_{cont}", on_click=add_surcharge, args=(cont,))
+    confirm_duplicate = False
+    if duplicate:
+        confirm_duplicate = st.checkbox("Submit anyway with a repeated operation number", key="confirm_duplicate")
 
-        total_rounded = math.ceil(total * 100) / 100
-        symbol = "$" if currency_total == "USD" else "$"
-        suffix = "USD" if currency_total == "USD" else "COP"
-        formatted_total = f"{symbol}{total_rounded:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") + f" {suffix}"
-        st.markdown(f"### **Total: {formatted_total}**")
+    send = st.button('Send Information')
 
-    request_data = {
-        "no_solicitud": no_solicitud,
-        "commercial": commercial,
-        "client": st.session_state.get("client", client),
-        "customer_name": customer_name,
-        "customer_phone": customer_phone,
-        "customer_email": customer_email,
-        "container_type": container_type,
-        "transport_type": transport_type,
-        "operation_type": operation_type,
-        "reference": reference,
-        "additional_surcharges": st.session_state["additional_surcharges"],
-        "trm": trm,
-        "total_cop_trm": formatted_total
-    }
+    if send and duplicate and not confirm_duplicate:
+        st.error(f"⚠️ Operation number '{no_solicitud}' already exists. Check it or confirm to submit anyway.")
 
-    if st.button('Send Information'):
+    elif send:
 
-        save_to_google_sheets(request_data, start_time)
+        # Cada etapa del envío queda como span de la traza "submit" (services.tracing)
+        with span("submit"):
+            with span("store.save"):
+                request_id = save_request(request, start_time)
+                operation_index.add(request.no_solicitud)
+                # El PDF sale del registro guardado, igual que si se regenera después
+                request = get_request_store().get(request_id) if request_id else request
 
-        st.success("Information saved successfully!")
+            st.success(f"Information saved successfully! Request ID: {request_id}")
 
-        client_normalized = st.session_state.get("client", client).strip().lower() if client else ""
+            client_name = st.session_state.get("client", client)
 
-        if client_normalized and all(c.strip().lower() != client_normalized for c in st.session_state["clients_list"]):
-            sheet = client_gcp.open_by_key(time_sheet_id)
-            worksheet = sheet.worksheet("clientes")
-            worksheet.append_row([st.session_state.get("client", client)])
-            st.session_state["clients_list"].append(client)
-            st.session_state["client"] = None
-            load_clients.clear()
-            st.rerun()
+            # El cliente nuevo queda en la réplica local de inmediato; la cola lo escribe en la hoja
+            if client_name and client_name.strip() and not client_exists(client_name):
+                with span("clients.add"):
+                    add_client(client_name)
 
-        pdf_filename = generate_pdf(request_data)
+            with span("pdf.generate"):
+                pdf_bytes = cached_generate_pdf(request)
 
-        with open(pdf_filename, "rb") as f:
-            pdf_bytes = f.read()
+            # Copia en Drive en segundo plano; la descarga no espera a la subida
+            with span("drive.submit"):
+                archive_pdf(pdf_bytes, request)
 
         st.download_button(
             label="Download PDF",
             data=pdf_bytes,
             file_name="Solicitud de Anticipo.pdf",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            mime="application/pdf"
         )
\ No newline at end of file